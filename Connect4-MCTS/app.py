@@ -5,11 +5,49 @@ from typing import List
 from fastapi.middleware.cors import CORSMiddleware
 from connect4 import Connect4
 from mcts import ucb2_agent
+from store import MCTSStore
+from evaluate import cutoff_playout
+from ntuple import NTupleNetwork
+from threats import proven_playout
+from gamelog import GameLog
+from move_cache import MoveCache
+import mcts
 import copy
+import os
+import threading
+import time
 
 app = FastAPI()
 game = Connect4()
 
+# opt-in persistent statistics for opening positions, e.g. MCTS_STORE=mcts_store.bin
+store = MCTSStore(os.environ["MCTS_STORE"]) if os.environ.get("MCTS_STORE") else None
+# opt-in evaluation-cutoff playouts, e.g. MCTS_CUTOFF_PLIES=8 (default: random games to the end)
+playout = cutoff_playout(int(os.environ["MCTS_CUTOFF_PLIES"])) if os.environ.get("MCTS_CUTOFF_PLIES") else None
+# opt-in n-tuple network (see train_ntuple.py), e.g. MCTS_NTUPLE=ntuple.npz: cutoff playouts end with its value
+# (MCTS_CUTOFF_PLIES, default 4) and with MCTS_NTUPLE_PRIOR=<visits> new nodes start at its value
+network = NTupleNetwork.load(os.environ["MCTS_NTUPLE"]) if os.environ.get("MCTS_NTUPLE") else None
+if network is not None:
+    playout = cutoff_playout(int(os.environ.get("MCTS_CUTOFF_PLIES", "4")), network.evaluate)
+# opt-in odd/even threat analysis, MCTS_THREATS=1: positions it proves are scored without a playout
+threat_analysis = os.environ.get("MCTS_THREATS") == "1"
+if threat_analysis:
+    playout = proven_playout(playout or mcts.randomly_play)
+prior_visits = float(os.environ.get("MCTS_NTUPLE_PRIOR", "0"))
+prior = network.prior(prior_visits) if network is not None and prior_visits > 0 else None
+# opt-in RAVE/AMAF statistics in tree selection, MCTS_RAVE=1
+rave = os.environ.get("MCTS_RAVE") == "1"
+# memory budget for the search tree in MB, least-visited leaves are evicted beyond it
+max_memory_mb = float(os.environ["MCTS_MAX_MEMORY_MB"]) if os.environ.get("MCTS_MAX_MEMORY_MB") else None
+# opt-in binary record of every served move, e.g. CONNECT4_GAME_LOG=games.log (see gamelog.py)
+game_log = GameLog(os.environ["CONNECT4_GAME_LOG"]) if os.environ.get("CONNECT4_GAME_LOG") else None
+# opt-in cache of chosen moves for repeated positions, e.g. MCTS_CACHE_SIZE=4096 (MCTS_CACHE_TTL seconds, default 600)
+move_cache = MoveCache(int(os.environ["MCTS_CACHE_SIZE"]), float(os.environ.get("MCTS_CACHE_TTL", "600"))) \
+    if os.environ.get("MCTS_CACHE_SIZE") else None
+# everything besides the position that changes the chosen move; part of the cache key
+search_settings = (os.environ.get("MCTS_CUTOFF_PLIES"), rave, max_memory_mb, store is not None,
+                   os.environ.get("MCTS_NTUPLE"), prior_visits, threat_analysis)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -33,6 +71,10 @@ class Connect4Agent:
         self.pos = self.game.get_initial_position()
         self.computer_moves_made = 0 
         self.old_board = [[0 for _ in range(7)] for _ in range(6)]
+        self.moves = []  # columns played this game, for the game log
+        # guards the game state above; the search runs outside it, so identical concurrent
+        # requests can share one search through the move cache
+        self.lock = threading.Lock()
 
     def board_move(self, col, turn):
         for i in range(5, -1, -1):
@@ -43,6 +85,14 @@ class Connect4Agent:
 
     #     return move
     def create_position_from_game_state(self, gs: GameState) -> int:
+        with self.lock:
+            pos, moves, time_limit = self.update_position(gs)
+        ai_move = self.search(pos, moves, time_limit)
+        with self.lock:
+            self.record_move(pos, moves, ai_move)
+        return ai_move
+
+    def update_position(self, gs: GameState):
         non_zero_cells = sum(cell != 0 for row in gs.board for cell in row)
         if non_zero_cells == 0:
             self.pos = self.game.get_initial_position()
@@ -50,10 +100,12 @@ class Connect4Agent:
             self.computer_moves_made = 0
             # self.computer_moves_made
             self.old_board = [[0 for _ in range(7)] for _ in range(6)]  # reset old_board
+            self.moves = []
         elif non_zero_cells == 1:
             self.pos = self.game.get_initial_position()
             self.old_board = [[0 for _ in range(7)] for _ in range(6)]
             self.computer_moves_made = 0
+            self.moves = []
 
 
 
@@ -69,38 +121,59 @@ class Connect4Agent:
         # 2) If we found their move, apply it to the Position
         if opp_move is not None:
             self.pos = self.pos.move(opp_move)
+            self.moves.append(opp_move)
         
 
         # 3) Update our baseline board snapshot
         self.old_board = copy.deepcopy(gs.board)
 
-        # 4) Let the AI choose its move
-        if self.computer_moves_made <= 2:
-            strat = ucb2_agent(3)
-        elif self.computer_moves_made <= 8:
-            strat = ucb2_agent(5)
-        elif self.computer_moves_made <= 13:
-            strat = ucb2_agent(2)
+        return self.pos, list(self.moves), mcts.scheduled_time(self.computer_moves_made)
+
+    def search(self, pos, moves, time_limit):
+        # 4) Let the AI choose its move; nodes is None when the move came from the cache
+        strat = ucb2_agent(time_limit, store, playout, rave, max_memory_mb, prior)
+        start_time = time.time()
+        nodes = None
+
+        def run():
+            nonlocal nodes
+            move = strat(pos)
+            nodes = mcts.last_stats.get("leaves")
+            return move
+
+        if move_cache is not None:
+            ai_move = move_cache.get_or_compute((pos.key(), time_limit) + search_settings, run)
         else:
-            strat = ucb2_agent(1)
-        ai_move = strat(self.pos)
-        self.computer_moves_made += 1
+            ai_move = run()
+        if game_log is not None:
+            params = {"time_limit": time_limit, "rave": rave, "cutoff": os.environ.get("MCTS_CUTOFF_PLIES"),
+                      "max_memory_mb": max_memory_mb, "store": store is not None,
+                      "ntuple": os.environ.get("MCTS_NTUPLE"), "prior": prior_visits,
+                      "threats": threat_analysis, "cached": nodes is None}
+            game_log.append(moves, ai_move, time.time() - start_time, "mcts", params, nodes=nodes)
+        return ai_move
 
+    def record_move(self, pos, moves, ai_move):
+        # identical concurrent requests share a search but only the first applies its move;
+        # the others find the game state already moved on
+        if self.pos is not pos:
+            return
+        self.moves = moves + [ai_move]
+        self.computer_moves_made += 1
 
         # 5) Apply AI move to both Position and old_board
-        self.pos = self.pos.move(ai_move)
+        self.pos = pos.move(ai_move)
         # drop AI piece (1) into the lowest empty slot in old_board
         for r in range(5, -1, -1):
             if self.old_board[r][ai_move] == 0:
                 self.old_board[r][ai_move] = 2
                 break
 
-        return ai_move
-
 connect4agent = Connect4Agent()
 
+# plain def: FastAPI runs it in its threadpool, so a search does not block other requests
 @app.post("/api/connect4-move")
-async def make_move(game_state: GameState) -> AIResponse:
+def make_move(game_state: GameState) -> AIResponse:
     try:
 
         if not game_state.valid_moves:
@@ -1,36 +1,119 @@
+class Geometry:
+    # board size and bitboard constants; each column uses height + 1 bits (one spare bit on top)
+    # bitboards are Python ints, so boards larger than 64 bits need no special handling
+    def __init__(self, width, height, connect):
+        self.width = width
+        self.height = height
+        self.connect = connect
+        self.stride = height + 1
+        column = (1 << height) - 1
+        self.column_masks = [column << (self.stride * i) for i in range(width)]
+        self.full_mask = sum(self.column_masks)
+        # lowest cell of every column
+        self.bottom_mask = sum(1 << (self.stride * i) for i in range(width))
+        # shifts for horizontal, diagonal \, diagonal / and vertical lines
+        self.directions = (self.stride, self.stride - 1, self.stride + 1, 1)
+        self.key_bits = width * self.stride + 1
+
+_geometries = {}
+
+# returns the shared Geometry for a board size (positions compare geometries by identity)
+def get_geometry(width=7, height=6, connect=4):
+    size = (width, height, connect)
+    if size not in _geometries:
+        _geometries[size] = Geometry(width, height, connect)
+    return _geometries[size]
+
+STANDARD = get_geometry(7, 6, 4)
+# lowest cell of every column
+BOTTOM_MASK = STANDARD.bottom_mask
+
 class Connect4:
-    def __init__(self):
+    def __init__(self, width=7, height=6, connect=4):
         self.turn = 0
         self.result = None
         self.terminal = False
+        self.geometry = get_geometry(width, height, connect)
     def get_initial_position(self):
-        return Position(self.turn)
+        return Position(self.turn, geometry=self.geometry)
                 
 class Position:
-    def __init__(self, turn, mask = 0, position = 0, num_turns = 0):
+    def __init__(self, turn, mask = 0, position = 0, num_turns = 0, geometry = STANDARD):
         self.turn = turn
         self.result = None
         self.terminal = False
         self.num_turns = num_turns
         self.mask = mask
         self.position = position
+        self.geometry = geometry
         self._compute_hash()
+
+    # builds a position from a board (row 0 at the top, 0 = empty, 1 = first player, 2 = second player)
+    # player is the piece value (1 or 2) of the side to move; the board size gives the geometry
+    @staticmethod
+    def from_board(board, player, connect=4):
+        height = len(board)
+        width = len(board[0])
+        geometry = get_geometry(width, height, connect)
+        mask = 0
+        position = 0
+        num_turns = 0
+        for col in range(width):
+            for row in range(height):
+                cell = board[height - 1 - row][col]
+                if cell != 0:
+                    bit = 1 << (col * geometry.stride + row)
+                    mask |= bit
+                    num_turns += 1
+                    if cell == player:
+                        position |= bit
+        pos = Position(player - 1, mask, position, num_turns, geometry)
+        pos.game_over()
+        return pos
                 
+    # returns a move order (list of columns) that reaches board, for engines that need the game history
+    # player is the piece value of the side to move; returns None if no legal order exists
+    @staticmethod
+    def moves_from_board(board, player):
+        height = len(board)
+        width = len(board[0])
+        columns = [[board[row][col] for row in range(height - 1, -1, -1) if board[row][col] != 0]
+                   for col in range(width)]
+        total = sum(len(c) for c in columns)
+        first = player if total % 2 == 0 else 3 - player
+        dead_ends = set()
+
+        def search(heights, moves, mover):
+            if len(moves) == total:
+                return moves
+            if heights in dead_ends:
+                return None
+            for col in range(width):
+                if heights[col] < len(columns[col]) and columns[col][heights[col]] == mover:
+                    next_heights = heights[:col] + (heights[col] + 1,) + heights[col + 1:]
+                    found = search(next_heights, moves + [col], 3 - mover)
+                    if found is not None:
+                        return found
+            dead_ends.add(heights)
+            return None
+
+        return search((0,) * width, [], first)
+
     # returns new position
     def move(self, loc):
         new_position = self.position ^ self.mask
-        new_mask = self.mask | (self.mask + (1 << (loc*7)))
+        new_mask = self.mask | (self.mask + (1 << (loc * self.geometry.stride)))
 
-        new_pos = Position(int(not self.turn), new_mask, new_position, self.num_turns + 1)
+        new_pos = Position(int(not self.turn), new_mask, new_position, self.num_turns + 1, self.geometry)
         new_pos.game_over()
         return new_pos
     
     # return list of legal moves
     def legal_moves(self):
         bit_moves = []
-        for i in range(7):
-            col_mask = 0b111111 << 7 * i
-            if col_mask != self.mask & col_mask:
+        mask = self.mask
+        for i, col_mask in enumerate(self.geometry.column_masks):
+            if col_mask != mask & col_mask:
                 bit_moves.append(i)
         return bit_moves
     
@@ -47,12 +130,14 @@ class Position:
             self.result = None
             
         # mask when all spaces are full
-        if self.mask == 279258638311359:
+        if self.mask == self.geometry.full_mask:
             self.terminal = True
             self.result = 0
             
     def connected_four_fast(self):
         other_position = self.position ^ self.mask
+        if self.geometry is not STANDARD:
+            return self.connected_fast(other_position)
         
         # Horizontal check
         m = other_position & (other_position >> 7)
@@ -72,14 +157,82 @@ class Position:
             return True
         # Nothing found
         return False
-            
+
+    # generic version of connected_four_fast for any geometry: doubles the run length per step
+    def connected_fast(self, stones):
+        connect = self.geometry.connect
+        for shift in self.geometry.directions:
+            m = stones
+            run = 1
+            while run * 2 <= connect:
+                m = m & (m >> (run * shift))
+                run *= 2
+            if run < connect:
+                m = m & (m >> ((connect - run) * shift))
+            if m:
+                return True
+        return False
+
+    # cells where each playable column receives its next stone
+    def possible_mask(self):
+        return (self.mask + self.geometry.bottom_mask) & self.geometry.full_mask
+
+    # empty cells (playable now or later) that complete a line for stones
+    def winning_mask(self, stones):
+        connect = self.geometry.connect
+        cells = 0
+        for shift in self.geometry.directions:
+            # before[k]: stones on the k cells before the cell along the direction, after[k]: on the k cells after
+            before = [-1]
+            after = [-1]
+            for j in range(1, connect):
+                before.append(before[-1] & (stones << (j * shift)))
+                after.append(after[-1] & (stones >> (j * shift)))
+            if shift == 1:
+                # vertically only the cell on top of a run can be empty
+                cells |= before[connect - 1]
+            else:
+                for k in range(connect):
+                    cells |= before[k] & after[connect - 1 - k]
+        return cells & (self.geometry.full_mask ^ self.mask)
+
+    # playable cells that win for the side to move
+    def own_winning_mask(self):
+        return self.winning_mask(self.position) & self.possible_mask()
+
+    # cells (playable now or later) that win for the player who just moved
+    def opponent_winning_mask(self):
+        return self.winning_mask(self.position ^ self.mask)
+
+    # playable cells after which the opponent cannot win on the next move; 0 if every move loses
+    # (assumes the side to move has no winning move, check own_winning_mask first)
+    def non_losing_mask(self):
+        possible = self.possible_mask()
+        opponent_win = self.opponent_winning_mask()
+        forced = possible & opponent_win
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            possible = forced
+        # never play directly below an opponent winning cell
+        return possible & ~(opponent_win >> 1)
+
+    # columns of the cells in a mask
+    def columns(self, cells):
+        return [i for i, col_mask in enumerate(self.geometry.column_masks) if cells & col_mask]
+
     
     def _compute_hash(self):
         position_1 = self.position if self.turn == 0 else self.position ^ self.mask
         self.hash = 2 * hash((position_1, self.mask)) + self.turn
+
+    # unique integer key for the position (geometry.key_bits bits, 50 for the standard board), used by on-disk tables
+    def key(self):
+        position_1 = self.position if self.turn == 0 else self.position ^ self.mask
+        return ((position_1 + self.mask + self.geometry.bottom_mask) << 1) | self.turn
     
     def __hash__(self):
         return self.hash
     def __eq__(self, other):
-        return isinstance(other, Position) and self.turn == other.turn and self.mask == other.mask and self.position == other.position
+        return isinstance(other, Position) and self.turn == other.turn and self.mask == other.mask and self.position == other.position and self.geometry is other.geometry
 
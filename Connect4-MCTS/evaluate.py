@@ -0,0 +1,81 @@
+import math
+import random
+
+import params
+
+# Bitboard version of the window evaluation in backup.py (same weights, including tuned ones
+# from the "minimax" section of the parameter file), used to score positions where a playout
+# is cut off instead of playing it to the end.
+_tuned = params.load("minimax")
+THREE_IN_ROW = _tuned.get("THREE_IN_ROW", 1000)
+TWO_IN_ROW = _tuned.get("TWO_IN_ROW", 100)
+BLOCK_THREE = _tuned.get("BLOCK_THREE", 1200)
+BLOCK_TWO = _tuned.get("BLOCK_TWO", 100)
+SCALE = 2000.0  # score that maps to tanh(1) ~ 0.76
+
+# bit index of (col, row) is col * stride + row, row 0 at the bottom
+def _window_masks(geometry):
+    masks = []
+    length = geometry.connect
+    for col in range(geometry.width):
+        for row in range(geometry.height):
+            for dc, dr in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                end_col, end_row = col + (length - 1) * dc, row + (length - 1) * dr
+                if 0 <= end_col < geometry.width and 0 <= end_row < geometry.height:
+                    masks.append(sum(1 << ((col + i * dc) * geometry.stride + row + i * dr) for i in range(length)))
+    return masks
+
+# (own pieces, opponent pieces) -> score for windows that are not mixed, by pieces missing from a full line
+def _window_scores(connect):
+    scores = {}
+    for missing, own_score, other_score in ((1, THREE_IN_ROW, BLOCK_THREE), (2, TWO_IN_ROW, BLOCK_TWO), (3, 1, 1)):
+        if connect - missing > 0:
+            scores[(connect - missing, 0)] = own_score
+            scores[(0, connect - missing)] = -other_score
+    return scores
+
+_tables = {}
+
+def _get_tables(geometry):
+    tables = _tables.get(geometry)
+    if tables is None:
+        tables = _tables[geometry] = (_window_masks(geometry), _window_scores(geometry.connect))
+    return tables
+
+def window_score(pos):
+    # scored for the side to move like backup.py (opponent threes weigh more), returned from player 0's view
+    window_masks, window_scores = _get_tables(pos.geometry)
+    own = pos.position
+    other = pos.position ^ pos.mask
+    score = 0
+    for w in window_masks:
+        a = own & w
+        b = other & w
+        if a and b:
+            continue
+        if a:
+            score += window_scores.get((a.bit_count(), 0), 0)
+        elif b:
+            score += window_scores.get((0, b.bit_count()), 0)
+    return score if pos.turn == 0 else -score
+
+def evaluate(pos):
+    # value in [-1, 1] from player 0's point of view, same scale as game results
+    if pos.terminal:
+        return float(pos.result)
+    return math.tanh(window_score(pos) / SCALE)
+
+def cutoff_playout(plies, evaluator=evaluate):
+    # playout policy: random moves for at most `plies` plies, then the static evaluation
+    # (or another evaluator: pos -> value in [-1, 1] from player 0's point of view, e.g. ntuple.NTupleNetwork.evaluate)
+    def play(pos, played=None):
+        cur_pos = pos
+        for _ in range(plies):
+            if cur_pos.terminal:
+                return float(cur_pos.result)
+            loc = random.choice(cur_pos.legal_moves())
+            if played is not None:
+                played.append((cur_pos.turn, loc))
+            cur_pos = cur_pos.move(loc)
+        return evaluator(cur_pos)
+    return play
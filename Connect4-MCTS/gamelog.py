@@ -0,0 +1,107 @@
+import json
+import math
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# Append-only binary log of served moves, one record per engine decision.
+#
+# file:   MAGIC, then records back to back
+# record: u16 length of the rest of the record
+#         FIXED (timestamp, chosen move, number of moves, think time, depth, score, nodes)
+#         moves leading to the position, two columns per byte (high nibble first)
+#         u8 length + engine name
+#         u16 length + engine parameters and extra stats as compact JSON
+# depth -1, score NaN and nodes 0 mean "not reported". Games can be regrouped offline since the
+# move sequence of each record extends the previous record of the same game.
+MAGIC = b"C4GL\x01"
+LENGTH = struct.Struct("<H")
+FIXED = struct.Struct("<dBBfhdI")
+
+GameRecord = namedtuple("GameRecord", "timestamp moves move think_time engine params depth score nodes")
+
+def encode_moves(moves):
+    padded = list(moves) + [0xF] * (len(moves) % 2)
+    return bytes((padded[i] << 4) | padded[i + 1] for i in range(0, len(padded), 2))
+
+def decode_moves(data, count):
+    moves = []
+    for byte in data:
+        moves.append(byte >> 4)
+        moves.append(byte & 0xF)
+    return moves[:count]
+
+def encode_record(record):
+    engine = record.engine.encode()
+    params = json.dumps(record.params, separators=(",", ":")).encode()
+    body = b"".join([
+        FIXED.pack(
+            record.timestamp, record.move, len(record.moves), record.think_time,
+            -1 if record.depth is None else record.depth,
+            math.nan if record.score is None else record.score,
+            record.nodes or 0,
+        ),
+        encode_moves(record.moves),
+        bytes([len(engine)]), engine,
+        LENGTH.pack(len(params)), params,
+    ])
+    return LENGTH.pack(len(body)) + body
+
+def decode_record(body):
+    timestamp, move, num_moves, think_time, depth, score, nodes = FIXED.unpack_from(body, 0)
+    offset = FIXED.size
+    moves = decode_moves(body[offset:offset + (num_moves + 1) // 2], num_moves)
+    offset += (num_moves + 1) // 2
+    engine_len = body[offset]
+    engine = body[offset + 1:offset + 1 + engine_len].decode()
+    offset += 1 + engine_len
+    (params_len,) = LENGTH.unpack_from(body, offset)
+    params = json.loads(body[offset + LENGTH.size:offset + LENGTH.size + params_len])
+    return GameRecord(timestamp, moves, move, think_time, engine, params,
+                      None if depth < 0 else depth, None if math.isnan(score) else score, nodes or None)
+
+class GameLog:
+    # thread-safe appender; every record is flushed so a crash loses at most the record being written
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+
+    def append(self, moves, move, think_time, engine, params=None, depth=None, score=None, nodes=None):
+        record = GameRecord(time.time(), list(moves), move, think_time, engine, params or {}, depth, score, nodes)
+        data = encode_record(record)
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def read_records(path, chunk_size=1 << 20):
+    # streams records from a log without loading it; a truncated last record is ignored
+    with open(path, "rb", buffering=chunk_size) as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game log")
+        while True:
+            header = f.read(LENGTH.size)
+            if len(header) < LENGTH.size:
+                return
+            (length,) = LENGTH.unpack(header)
+            body = f.read(length)
+            if len(body) < length:
+                return
+            yield decode_record(body)
+
+def board_from_moves(moves):
+    # 6x7 board (row 0 at the top) and the piece value of the side to move; the first player uses 1
+    board = [[0 for _ in range(7)] for _ in range(6)]
+    for i, col in enumerate(moves):
+        for row in range(5, -1, -1):
+            if board[row][col] == 0:
+                board[row][col] = 1 if i % 2 == 0 else 2
+                break
+    return board, 1 if len(moves) % 2 == 0 else 2
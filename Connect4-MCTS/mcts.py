@@ -2,44 +2,107 @@ import random
 import math
 import time
 
-def get_nodes(initial_pos, time_limit):
+import params
+
+# search constants, overridden by the "mcts" section of the tuned parameter file (see params.py, tune.py)
+_tuned = params.load("mcts")
+UCB_C = _tuned.get("UCB_C", 2.0)  # exploration constant of get_score
+NUM_RUNS = _tuned.get("NUM_RUNS", 10)  # playouts per expanded leaf
+# seconds per move by the number of moves the engine has made this game:
+# [[up to this many moves, seconds], ...], None for all later moves
+TIME_SCHEDULE = _tuned.get("TIME_SCHEDULE", [[2, 3], [8, 5], [13, 2], [None, 1]])
+
+# RAVE: AMAF values are blended into get_score with weight sqrt(RAVE_K / (3 * n + RAVE_K)),
+# so they dominate for rarely visited children and fade out as real visits accumulate
+RAVE_K = 500
+
+# Approximate memory of one tree node (Position, stats tuple, parent dict and the nodes entry), the unit
+# of max_memory_mb and of the reported peak memory; tracemalloc measures about 790 bytes on CPython 3.11,
+# tests/test_mcts.py checks it stays within 25%
+NODE_BYTES = 800
+EVICT_FRACTION = 0.1  # share of the tree evicted at once when the memory budget is hit
+PROGRESS_INTERVAL = 0.1  # seconds between progress callbacks
+
+# statistics of the last get_nodes call
+last_stats = {}
+
+def new_node(pos, parent, store=None, priors=None, prior=None):
+    # node stats are (wins, visits, {parent: visits through parent}); seeded from the store if given,
+    # otherwise from the prior function
+    if store is not None:
+        stored = store.get(pos)
+        if stored is not None:
+            priors[pos] = stored
+            return (stored[0], stored[1], {parent: 0})
+    if prior is not None:
+        seed = prior(pos)
+        priors[pos] = seed
+        return (seed[0], seed[1], {parent: 0})
+    return (0.0, 0.0, {parent: 0})
+
+# playout: simulation policy, (pos, moves) -> reward for player 0, appending (turn, column) of every
+# move it plays to moves unless it is None (default: random game to the end;
+# see evaluate.cutoff_playout for playouts cut off after a few plies)
+# rave: keep all-moves-as-first statistics and use them in selection
+# max_memory_mb: memory budget for the tree; when it is reached the search either stops
+# growing the tree (on_full="stop") or evicts the least-visited leaves (on_full="evict")
+# progress: called as progress(leaves, nodes) every PROGRESS_INTERVAL seconds
+# stop: threading.Event that ends the search early when set
+# prior: pos -> (wins, visits) virtual statistics for new nodes not in the store (e.g. ntuple.NTupleNetwork.prior)
+def get_nodes(initial_pos, time_limit, store=None, playout=None, rave=False, max_memory_mb=None, on_full="evict",
+              progress=None, stop=None, prior=None):
+    if playout is None:
+        playout = randomly_play
     print(f"Starting MCTS simulation for position with turn {initial_pos.turn}")
     nodes = {}
-    nodes[initial_pos] = (0.0, 0.0, {initial_pos: 0})
+    priors = {}
+    amaf = {} if rave else None
+    max_nodes = int(max_memory_mb * 1024 * 1024 / NODE_BYTES) if max_memory_mb is not None else None
+    peak_nodes = 0
+    evicted = 0
+    expand = True
+    nodes[initial_pos] = new_node(initial_pos, initial_pos, store, priors, prior)
     start_time = time.time()
+    last_progress = start_time
     leaf_count = 0
     while time.time() - start_time < time_limit:
+        if stop is not None and stop.is_set():
+            break
+        if progress is not None and time.time() - last_progress >= PROGRESS_INTERVAL:
+            progress(leaf_count, nodes)
+            last_progress = time.time()
         leaf_count += 1
-        leaf_path = get_leaf(nodes, initial_pos)
+        if max_nodes is not None and len(nodes) >= max_nodes:
+            if on_full == "evict":
+                evicted += evict_leaves(nodes, initial_pos, amaf, int(max_nodes * EVICT_FRACTION) + 1)
+            else:
+                expand = False
+        leaf_path = get_leaf(nodes, initial_pos, store, priors, amaf, expand, prior)
         leaf = leaf_path[-1]
         
         if leaf not in nodes:
-            nodes[leaf] = (0.0, 0.0, {leaf_path[-2] if len(leaf_path) > 1 else initial_pos: 0})
+            nodes[leaf] = new_node(leaf, leaf_path[-2] if len(leaf_path) > 1 else initial_pos, store, priors, prior)
         
         _, ni, _ = nodes[leaf]
         
-        if ni > 0 and not leaf.terminal:
+        if ni > 0 and not leaf.terminal and expand:
             legal_moves = leaf.legal_moves()
             for loc in legal_moves:
                 new_pos = leaf.move(loc)
                 if new_pos not in nodes:
-                    nodes[new_pos] = (0.0, 0.0, {leaf: 0})
+                    nodes[new_pos] = new_node(new_pos, leaf, store, priors, prior)
             loc = random.choice(legal_moves)
             child_pos = leaf.move(loc)
-            reward = 0
-            num_runs = 10
-            for _ in range(num_runs):
-                reward += randomly_play(child_pos)
+            num_runs = NUM_RUNS
+            reward = run_playouts(leaf_path + [child_pos], num_runs, playout, amaf)
             w, n, parent_n_dict = nodes[child_pos]
             if leaf not in parent_n_dict:
                 parent_n_dict[leaf] = 0
             parent_n_dict[leaf] += 1
             nodes[child_pos] = (w + reward, n + num_runs, parent_n_dict)
         else:
-            reward = 0
-            num_runs = 10
-            for _ in range(num_runs):
-                reward += randomly_play(leaf)
+            num_runs = NUM_RUNS
+            reward = run_playouts(leaf_path, num_runs, playout, amaf)
         
         parent = initial_pos
         for position in leaf_path:
@@ -47,39 +110,111 @@ def get_nodes(initial_pos, time_limit):
             parent_n_dict[parent] += num_runs
             nodes[position] = (w + reward, n + num_runs, parent_n_dict)
             parent = position
-    print(f"MCTS completed: processed {leaf_count} leaves")
+        peak_nodes = max(peak_nodes, len(nodes))
+    peak_mb = peak_nodes * NODE_BYTES / (1024 * 1024)
+    last_stats.clear()
+    last_stats.update(leaves=leaf_count, nodes=len(nodes), peak_nodes=peak_nodes, peak_mb=peak_mb, evicted=evicted)
+    print(f"MCTS completed: processed {leaf_count} leaves, peak {peak_nodes} nodes (~{peak_mb:.1f} MB)")
+    if store is not None:
+        store.commit(nodes, priors)
     return nodes
 
-def ucb2_agent(time_limit):
+def evict_leaves(nodes, root, amaf, count):
+    # removes up to count least-visited leaves; the root and its children are kept for move selection.
+    # Ancestors keep the wins/visits the evicted nodes contributed, so their statistics stay consistent;
+    # an evicted position is simply re-created with fresh statistics if the search reaches it again.
+    parents = set()
+    for pos, (_, _, parent_n_dict) in nodes.items():
+        if pos != root:
+            parents.update(parent_n_dict)
+    protected = {root.move(loc) for loc in root.legal_moves()}
+    protected.add(root)
+    leaves = [pos for pos in nodes if pos not in parents and pos not in protected]
+    leaves.sort(key=lambda pos: nodes[pos][1])
+    for pos in leaves[:count]:
+        del nodes[pos]
+        if amaf is not None:
+            amaf.pop(pos, None)
+    return min(count, len(leaves))
+
+def run_playouts(path, num_runs, playout, amaf=None):
+    # total reward of num_runs playouts from the end of path; updates AMAF statistics of the path if given
+    reward = 0
+    for _ in range(num_runs):
+        moves = [] if amaf is not None else None
+        result = playout(path[-1], moves)
+        if amaf is not None:
+            update_amaf(amaf, path, moves, result)
+        reward += result
+    return reward
+
+def move_column(pos, next_pos):
+    return ((pos.mask ^ next_pos.mask).bit_length() - 1) // pos.geometry.stride
+
+def update_amaf(amaf, path, playout_moves, reward):
+    # every node on the path gets credit for each column its side to move played later in the simulation
+    sequence = [(pos.turn, move_column(pos, next_pos)) for pos, next_pos in zip(path, path[1:])] + playout_moves
+    seen = (set(), set())
+    j = len(sequence)
+    for i in range(len(path) - 1, -1, -1):
+        while j > i:
+            j -= 1
+            turn, col = sequence[j]
+            seen[turn].add(col)
+        node = path[i]
+        stats = amaf.get(node)
+        if stats is None:
+            stats = amaf[node] = [[0.0, 0] for _ in range(node.geometry.width)]
+        for col in seen[node.turn]:
+            stats[col][0] += reward
+            stats[col][1] += 1
+
+def scheduled_time(moves_made, schedule=None):
+    # seconds for the next move from TIME_SCHEDULE (or the given schedule)
+    schedule = schedule or TIME_SCHEDULE
+    for up_to, seconds in schedule:
+        if up_to is None or moves_made <= up_to:
+            return seconds
+    return schedule[-1][1]
+
+def ucb2_agent(time_limit, store=None, playout=None, rave=False, max_memory_mb=None, prior=None):
     def strat(pos):
-        nodes = get_nodes(pos, time_limit)
-        player = pos.turn
-        best_score = float('-inf') if player == 0 else float('inf')
-        next_best_move = None
-        
-        for loc in pos.legal_moves():
-            next_pos = pos.move(loc)
-            score = 0.0
-            if next_pos in nodes:
-                w, n, _ = nodes[next_pos]
-                score = w / n if n > 0 else 0.0
-            if (player == 1 and score < best_score) or (player == 0 and score > best_score):
-                best_score = score
-                next_best_move = loc
-                print(f"Selected move {next_best_move} with score {best_score}")
-        
-        return next_best_move
+        nodes = get_nodes(pos, time_limit, store, playout, rave, max_memory_mb, prior=prior)
+        return best_move(pos, nodes)
     return strat
 
-def randomly_play(pos):
+# picks the child with the best average reward for the side to move
+def best_move(pos, nodes, verbose=True):
+    player = pos.turn
+    best_score = float('-inf') if player == 0 else float('inf')
+    next_best_move = None
+    
+    for loc in pos.legal_moves():
+        next_pos = pos.move(loc)
+        score = 0.0
+        if next_pos in nodes:
+            w, n, _ = nodes[next_pos]
+            score = w / n if n > 0 else 0.0
+        if (player == 1 and score < best_score) or (player == 0 and score > best_score):
+            best_score = score
+            next_best_move = loc
+            if verbose:
+                print(f"Selected move {next_best_move} with score {best_score}")
+    
+    return next_best_move
+
+def randomly_play(pos, played=None):
     cur_pos = pos
     while not cur_pos.terminal:
         moves = cur_pos.legal_moves()
         loc = random.choice(moves)
+        if played is not None:
+            played.append((cur_pos.turn, loc))
         cur_pos = cur_pos.move(loc)
     return float(cur_pos.result)
 
-def get_leaf(nodes, root):
+# expand=False: never add nodes; stop at the first node with an unvisited child instead
+def get_leaf(nodes, root, store=None, priors=None, amaf=None, expand=True, prior=None):
     current_node = root
     path = []
     while True:
@@ -97,7 +232,9 @@ def get_leaf(nodes, root):
         for loc in legal_moves:
             result_position = current_node.move(loc)
             if result_position not in nodes:
-                nodes[result_position] = (0.0, 0.0, {current_node: 0})
+                if not expand:
+                    return path
+                nodes[result_position] = new_node(result_position, current_node, store, priors, prior)
                 path.append(result_position)
                 return path
             temp_w, temp_ni, temp_parent_n_count = nodes[result_position]
@@ -107,7 +244,8 @@ def get_leaf(nodes, root):
                 path.append(result_position)
                 return path
             
-            score = get_score(nodes[current_node][1], temp_parent_n_count[current_node], temp_w / temp_ni if temp_ni > 0 else 0.0, next_player)
+            rave_stats = amaf[current_node][loc] if amaf is not None and current_node in amaf else None
+            score = get_score(nodes[current_node][1], temp_parent_n_count[current_node], temp_w / temp_ni if temp_ni > 0 else 0.0, next_player, rave_stats=rave_stats)
             if (next_player == 1 and score < best_score) or (next_player == 0 and score > best_score):
                 best_score = score
                 next_best_node = result_position
@@ -118,5 +256,10 @@ def get_leaf(nodes, root):
             return path
     return path
 
-def get_score(N, ni, r, player, c=2.0):
+def get_score(N, ni, r, player, c=None, rave_stats=None):
+    if c is None:
+        c = UCB_C
+    if rave_stats is not None and rave_stats[1] > 0:
+        beta = math.sqrt(RAVE_K / (3 * ni + RAVE_K))
+        r = (1 - beta) * r + beta * rave_stats[0] / rave_stats[1]
     return r + math.sqrt(c * math.log(N) / ni) if player == 0 else r - math.sqrt(c * math.log(N) / ni)
\ No newline at end of file
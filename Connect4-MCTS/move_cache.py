@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+# In-memory LRU cache of search results shared by all requests of a server process.
+# Keys are hashable (e.g. Position.key() plus the engine settings), entries expire after ttl seconds
+# and the least recently used entry is dropped beyond max_entries. Identical lookups that arrive
+# while a search is running wait for it instead of starting their own.
+
+class _Pending:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class MoveCache:
+    def __init__(self, max_entries=4096, ttl=600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expiry time, value), oldest use first
+        self.pending = {}  # key -> _Pending for searches in progress
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._lookup(key, time.time())
+        return None if entry is None else entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (time.time() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # returns the cached value for key, or runs compute() once for all concurrent callers and caches it;
+    # waiters get the same value (or exception) as the caller that ran the search
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            entry = self._lookup(key, time.time())
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            pending = self.pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self.pending[key] = _Pending()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+                if pending.error is None:
+                    self._store(key, pending.value)
+            pending.event.set()
+        return pending.value
+
+    def __len__(self):
+        # entries stored, including expired ones not looked up since
+        with self.lock:
+            return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
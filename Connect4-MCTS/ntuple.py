@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+
+from connect4 import STANDARD
+
+# n-tuple value network: lookup tables indexed by the contents of small groups of cells.
+# The value of a position for the side to move is tanh of the sum of one table entry per tuple,
+# so evaluating it is a handful of shifts and list lookups, no arithmetic beyond the sum.
+#
+# Tuples are the 2x4 and 4x2 blocks of the standard board (8 cells, 3^8 entries each).
+# A cell is 0 empty, 1 own stone, 2 opponent stone (digit i of the index for the i-th cell).
+# file (np.savez_compressed): weights float32 [tuples, 3^8], cells int8 [tuples, 8] bit indices
+# in the connect4.Position layout. Train with train_ntuple.py; use network.evaluate as the leaf
+# evaluation of evaluate.cutoff_playout and network.prior as the prior of mcts.get_nodes.
+
+def block_tuples(geometry=STANDARD):
+    tuples = []
+    for cols, rows in ((4, 2), (2, 4)):
+        for col in range(geometry.width - cols + 1):
+            for row in range(geometry.height - rows + 1):
+                tuples.append([(col + dc) * geometry.stride + row + dr for dc in range(cols) for dr in range(rows)])
+    return tuples
+
+def mirror(stones, geometry=STANDARD):
+    """Bitboard reflected left to right; positions and their mirror images have the same value"""
+    column = (1 << geometry.stride) - 1
+    result = 0
+    for col in range(geometry.width):
+        result |= ((stones >> (col * geometry.stride)) & column) << ((geometry.width - 1 - col) * geometry.stride)
+    return result
+
+class NTupleNetwork:
+    def __init__(self, cells, weights=None):
+        self.cells = [list(map(int, tuple_cells)) for tuple_cells in cells]
+        size = 3 ** max(len(tuple_cells) for tuple_cells in self.cells)
+        self.weights = np.zeros((len(self.cells), size), dtype=np.float32) if weights is None \
+            else np.asarray(weights, dtype=np.float32)
+        width = max(len(tuple_cells) for tuple_cells in self.cells)
+        # base3[pattern]: index digits of the cells set in an n-bit pattern
+        self.base3 = [sum(3 ** i for i in range(width) if pattern >> i & 1) for pattern in range(1 << width)]
+        # runs of consecutive bits (cells stacked in one column) gathered with one shift and mask:
+        # (shift, mask, offset in the pattern)
+        self.segments = []
+        for tuple_cells in self.cells:
+            segments = []
+            start = 0
+            for i in range(1, len(tuple_cells) + 1):
+                if i == len(tuple_cells) or tuple_cells[i] != tuple_cells[i - 1] + 1:
+                    segments.append((tuple_cells[start], (1 << (i - start)) - 1, start))
+                    start = i
+            self.segments.append(segments)
+        self.refresh()
+
+    def refresh(self):
+        """Copy the weights to Python lists for lookups; call after changing self.weights"""
+        self.tables = list(zip(self.weights.tolist(), self.segments))
+
+    @staticmethod
+    def new(geometry=STANDARD):
+        return NTupleNetwork(block_tuples(geometry))
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return NTupleNetwork(data["cells"], data["weights"])
+
+    def save(self, path):
+        np.savez_compressed(path, weights=self.weights, cells=np.array(self.cells, dtype=np.int8))
+
+    def raw(self, own, other):
+        base3 = self.base3
+        total = 0.0
+        for weights, segments in self.tables:
+            a = b = 0
+            for shift, mask, offset in segments:
+                a |= ((own >> shift) & mask) << offset
+                b |= ((other >> shift) & mask) << offset
+            total += weights[base3[a] + 2 * base3[b]]
+        return total
+
+    def value(self, own, other):
+        """Value in [-1, 1] for the side to move, own and other are its and the opponent's stones"""
+        return math.tanh(self.raw(own, other))
+
+    def evaluate(self, pos):
+        # value in [-1, 1] from player 0's point of view, same scale as evaluate.evaluate and game results
+        if pos.terminal:
+            return float(pos.result)
+        value = self.value(pos.position, pos.position ^ pos.mask)
+        return value if pos.turn == 0 else -value
+
+    def prior(self, visits):
+        # MCTS selection prior: new nodes start with `visits` virtual visits at the network value
+        def get(pos):
+            return (self.evaluate(pos) * visits, float(visits))
+        return get
+
+    def train(self, own, other, labels, learning_rate):
+        """One SGD step on the squared error of tanh(raw) against labels (arrays of positions); returns the mean error.
+        Lookups keep the old weights until refresh()"""
+        own = np.asarray(own, dtype=np.uint64)
+        other = np.asarray(other, dtype=np.uint64)
+        labels = np.asarray(labels, dtype=np.float32)
+        base3 = np.array(self.base3, dtype=np.int64)
+        index = np.empty((len(self.cells), len(labels)), dtype=np.int64)
+        for t, segments in enumerate(self.segments):
+            a = np.zeros(len(labels), dtype=np.uint64)
+            b = np.zeros(len(labels), dtype=np.uint64)
+            for shift, mask, offset in segments:
+                a |= ((own >> np.uint64(shift)) & np.uint64(mask)) << np.uint64(offset)
+                b |= ((other >> np.uint64(shift)) & np.uint64(mask)) << np.uint64(offset)
+            index[t] = base3[a.astype(np.int64)] + 2 * base3[b.astype(np.int64)]
+        values = np.tanh(self.weights[np.arange(len(self.cells))[:, None], index].sum(axis=0))
+        error = labels - values
+        # learning_rate is shared by the tuples, every position updates one entry of each
+        step = (learning_rate / len(self.cells) * error * (1 - values * values)).astype(np.float32)
+        for t in range(len(self.cells)):
+            np.add.at(self.weights[t], index[t], step)
+        return float(np.mean(error * error))
@@ -0,0 +1,31 @@
+import json
+import os
+
+# Tuned search parameters written by tune.py, read by the engines at import time.
+#
+# file: JSON object, section name -> {constant name: value}, e.g.
+#       {"mcts": {"UCB_C": 1.4, "NUM_RUNS": 6}, "minimax": {"THREE_IN_ROW": 900}}
+#       sections: "mcts" (mcts.py), "minimax" (backup.py, evaluate.py), "pyspiel" (lib-bot.py);
+#       "tuning" holds how each section was tuned and is not read by the engines
+# Missing files, sections and names keep the defaults in the code.
+PATH = os.environ.get("CONNECT4_PARAMS",
+                      os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tuned_params.json"))
+
+def load_all(path=PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def load(section, path=PATH):
+    """{constant name: value} of one section, empty if the file or the section does not exist"""
+    return load_all(path).get(section, {})
+
+def save(section, values, tuning=None, path=PATH):
+    """Replace one section of the file, keeping the others"""
+    data = load_all(path)
+    data[section] = values
+    if tuning is not None:
+        data.setdefault("tuning", {})[section] = tuning
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,139 @@
+import sys
+import time
+from collections import namedtuple
+
+from connect4 import Connect4
+
+# Depth-first proof-number search (df-pn) for forced wins.
+# Every node stores (phi, delta) from the point of view of the side to move: phi is the proof number
+# of "the side to move reaches its goal" and delta its disproof number. The attacker's goal is a win,
+# the defender's goal is not to lose, so a draw counts against the attacker.
+INF = 10 ** 9
+ENTRY_BYTES = 200  # rough size of one transposition table entry
+CHECK_INTERVAL = 1024  # nodes between deadline checks
+GC_FRACTION = 0.5  # share of the table dropped (least work first) when it is full
+
+# status: "win" (attacker forces a win), "no-win" (it cannot), "unknown" (out of time)
+ProofResult = namedtuple("ProofResult", "status move nodes elapsed")
+
+class SearchTimeout(Exception):
+    pass
+
+class ProofNumberSearch:
+    def __init__(self, max_memory_mb=64):
+        self.max_entries = max(1024, int(max_memory_mb * 1024 * 1024 / ENTRY_BYTES))
+        self.table = {}  # pos.key() -> (phi, delta, work)
+        self.nodes = 0
+        self.attacker = 0
+        self.deadline = None
+
+    # attacker: turn (0 or 1) of the player trying to force a win, by default the side to move;
+    # the table is kept between calls with the same attacker, so repeated slices continue the proof
+    def solve(self, pos, time_limit, attacker=None):
+        attacker = pos.turn if attacker is None else attacker
+        if attacker != self.attacker:
+            self.table.clear()
+            self.attacker = attacker
+        start = time.time()
+        self.deadline = start + time_limit
+        nodes_before = self.nodes
+        try:
+            self._mid(pos, INF, INF)
+        except SearchTimeout:
+            pass
+
+        phi, delta = self._lookup(pos.key()) if not pos.terminal else self._decided(pos)
+        if pos.turn != attacker:
+            phi, delta = delta, phi
+        status = "win" if phi == 0 else "no-win" if delta == 0 else "unknown"
+        move = self._winning_move(pos) if status == "win" and pos.turn == attacker else None
+        return ProofResult(status, move, self.nodes - nodes_before, time.time() - start)
+
+    def _winning_move(self, pos):
+        wins = pos.columns(pos.own_winning_mask())
+        if wins:
+            return wins[0]
+        for col in pos.columns(pos.non_losing_mask()):
+            if self._lookup(pos.move(col).key())[1] == 0:
+                return col
+        return None
+
+    def _lookup(self, key):
+        entry = self.table.get(key)
+        return (1, 1) if entry is None else entry[:2]
+
+    def _store(self, key, phi, delta, work):
+        if len(self.table) >= self.max_entries and key not in self.table:
+            self._collect()
+        self.table[key] = (phi, delta, work)
+
+    def _collect(self):
+        # drop the entries that took the least work to compute
+        by_work = sorted(self.table, key=lambda k: self.table[k][2])
+        for key in by_work[:int(len(by_work) * GC_FRACTION)]:
+            del self.table[key]
+
+    # (phi, delta) of a position decided without search, or None
+    def _decided(self, pos):
+        if pos.terminal:
+            # a win for the previous player, or a draw, which only the defender wants
+            if pos.result == 0 and pos.turn != self.attacker:
+                return 0, INF
+            return INF, 0
+        if pos.own_winning_mask():
+            return 0, INF
+        if not pos.non_losing_mask():
+            return INF, 0
+        return None
+
+    def _mid(self, pos, th_phi, th_delta):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+        key = pos.key()
+        decided = self._decided(pos)
+        if decided is not None:
+            self._store(key, decided[0], decided[1], 1)
+            return
+
+        # only moves that do not lose at once; children decided at a glance are stored right away
+        children = []
+        for col in pos.columns(pos.non_losing_mask()):
+            child = pos.move(col)
+            child_key = child.key()
+            if child_key not in self.table:
+                child_decided = self._decided(child)
+                if child_decided is not None:
+                    self._store(child_key, child_decided[0], child_decided[1], 1)
+            children.append((child, child_key))
+
+        nodes_before = self.nodes
+        while True:
+            # phi = min delta over children, delta = sum of phi over children
+            phi, delta = INF, 0
+            best, best_phi, second = None, 0, INF
+            for child, child_key in children:
+                c_phi, c_delta = self._lookup(child_key)
+                delta = min(INF, delta + c_phi)
+                if c_delta < phi:
+                    second = phi
+                    phi, best, best_phi = c_delta, child, c_phi
+                elif c_delta < second:
+                    second = c_delta
+            if phi >= th_phi or delta >= th_delta:
+                break
+            self._mid(best, min(INF, th_delta + best_phi - delta), min(th_phi, second + 1))
+        self._store(key, phi, delta, self.nodes - nodes_before + 1)
+
+# analysis mode: python pns.py <moves, e.g. 3342> [seconds]
+if __name__ == "__main__":
+    pos = Connect4().get_initial_position()
+    for col in sys.argv[1] if len(sys.argv) > 1 else "":
+        pos = pos.move(int(col))
+    time_limit = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    search = ProofNumberSearch()
+    for attacker in (pos.turn, 1 - pos.turn):
+        result = search.solve(pos, time_limit, attacker)
+        who = "side to move" if attacker == pos.turn else "opponent"
+        print(f"{who}: {result.status} move {result.move} ({result.nodes} nodes, {result.elapsed:.2f}s)")
@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import messagebox
 from connect4 import Connect4
-from mcts import ucb2_agent
+from search_worker import SearchWorker
 import time
 import threading
 
+PROGRESS_POLL_MS = 16  # ~60 fps while the computer is thinking
+
 class Connect4GUI:
     def __init__(self, root):
         self.root = root
@@ -12,17 +14,20 @@ class Connect4GUI:
         self.game = Connect4()
         self.pos = self.game.get_initial_position()
         self.board = [[0 for _ in range(7)] for _ in range(6)]
-        self.strategy = ucb2_agent(7)
+        self.time_limit = 7
+        self.worker = None  # background search while the computer is thinking
         self.first_player = None  # True if computer goes first, False if player goes first
         self.lock = threading.Lock()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Ask who goes first
         self.ask_first_player()
 
         # Create the game grid
-        self.canvas = tk.Canvas(root, width=700, height=600, bg="blue")
+        self.canvas = tk.Canvas(root, width=700, height=640, bg="blue")
         self.canvas.pack(pady=20)
         self.draw_grid()
+        tk.Button(root, text="Restart", command=self.restart).pack()
 
         # Bind click event to canvas
         self.canvas.bind("<Button-1>", self.on_click)
@@ -60,6 +65,18 @@ class Connect4GUI:
                     self.canvas.create_oval(x1 + 10, y1 + 10, x2 - 10, y2 - 10, fill="red")
                 elif self.board[i][j] == 2:  # Player
                     self.canvas.create_oval(x1 + 10, y1 + 10, x2 - 10, y2 - 10, fill="yellow")
+        # Search progress: status line under the board and a marker on the current best column
+        self.status = self.canvas.create_text(350, 620, text="", fill="white", font=("Arial", 14))
+        self.best_marker = self.canvas.create_rectangle(0, 0, 0, 0, outline="green", width=4, state="hidden")
+
+    def draw_progress(self, worker):
+        text = f"Thinking... {worker.elapsed():.1f}s / {worker.time_limit}s, {worker.iterations} iterations"
+        if worker.best_col is not None:
+            text += f", best column {worker.best_col}"
+            x = worker.best_col * 100
+            self.canvas.coords(self.best_marker, x + 2, 2, x + 98, 598)
+            self.canvas.itemconfigure(self.best_marker, state="normal")
+        self.canvas.itemconfigure(self.status, text=text)
 
     def board_move(self, col, turn):
         for i in range(5, -1, -1):
@@ -85,12 +102,27 @@ class Connect4GUI:
         return False
 
     def computer_turn(self):
-        if self.pos.terminal:
+        if self.pos.terminal or self.worker is not None:
             return
         if (self.first_player and self.pos.turn == 0) or (not self.first_player and self.pos.turn == 1):
+            print("\nComputer is thinking...")
+            self.worker = SearchWorker(self.pos, self.time_limit)
+            self.poll_search(self.worker)
+        else:
+            self.root.after(100, self.computer_turn)
+
+    # runs on the Tk main loop until the background search finishes
+    def poll_search(self, worker):
+        if self.worker is not worker:  # cancelled by restart
+            return
+        if not worker.done():
+            self.draw_progress(worker)
+            self.root.after(PROGRESS_POLL_MS, self.poll_search, worker)
+            return
+        self.worker = None
+        if worker.result is not None:
             with self.lock:
-                print("\nComputer is thinking...")
-                move = self.strategy(self.pos)
+                move = worker.result
                 row = self.board_move(move, self.pos.turn)
                 if row is not None:
                     print(f"Computer moves to column {move}")
@@ -99,9 +131,26 @@ class Connect4GUI:
                     self.print_board()  # In trạng thái bảng sau nước đi của bot
                     if self.check_game_over():
                         return
-            self.root.after(500, self.player_turn)
-        else:
-            self.root.after(100, self.computer_turn)
+        self.root.after(500, self.player_turn)
+
+    def cancel_search(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+    def restart(self):
+        self.cancel_search()
+        self.pos = self.game.get_initial_position()
+        self.board = [[0 for _ in range(7)] for _ in range(6)]
+        self.ask_first_player()
+        self.draw_grid()
+        if self.first_player:
+            self.print_board()
+            self.root.after(500, self.computer_turn)
+
+    def on_close(self):
+        self.cancel_search()
+        self.root.destroy()
 
     def player_turn(self):
         if self.pos.terminal:
@@ -0,0 +1,36 @@
+import threading
+import time
+from mcts import get_nodes, best_move
+
+class SearchWorker:
+    # runs one MCTS search in a background thread so the caller (e.g. the Tk main loop) stays responsive;
+    # iterations and best_col are updated while the search runs, result is set when it finishes
+    def __init__(self, pos, time_limit, **search_options):
+        self.pos = pos
+        self.time_limit = time_limit
+        self.search_options = search_options
+        self.iterations = 0
+        self.best_col = None
+        self.result = None
+        self.stop = threading.Event()
+        self.start_time = time.time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        nodes = get_nodes(self.pos, self.time_limit, progress=self.on_progress, stop=self.stop, **self.search_options)
+        if not self.stop.is_set():
+            self.result = best_move(self.pos, nodes)
+
+    def on_progress(self, iterations, nodes):
+        self.iterations = iterations
+        self.best_col = best_move(self.pos, nodes, verbose=False)
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def cancel(self):
+        self.stop.set()
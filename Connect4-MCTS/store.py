@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+
+# Persistent statistics for shallow MCTS nodes, shared across games and restarts.
+# The file is a fixed-size open-addressing hash table keyed by Position.key():
+#   header: magic, version, slot count, generation
+#   slot:   key, wins, visits, generation of last update
+HEADER = struct.Struct("<8sIIQ")
+SLOT = struct.Struct("<QddQ")
+MAGIC = b"C4MCTS\x00\x00"
+VERSION = 1
+PROBES = 8
+
+
+class MCTSStore:
+    def __init__(self, path, max_mb=16, max_ply=10, decay=0.98, max_prior_visits=2000.0):
+        # max_ply: only positions with num_turns <= max_ply are loaded / saved
+        # decay: per-generation multiplier applied to old statistics (one generation = one commit)
+        # max_prior_visits: priors are scaled down so a stored node never outweighs a fresh search
+        self.path = path
+        self.max_ply = max_ply
+        self.decay = decay
+        self.max_prior_visits = max_prior_visits
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            size = os.path.getsize(path)
+            self.file = open(path, "r+b")
+            self.mm = mmap.mmap(self.file.fileno(), size)
+            magic, version, self.num_slots, self.generation = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or version != VERSION or size != HEADER.size + self.num_slots * SLOT.size:
+                self.mm.close()
+                self.file.close()
+                raise ValueError(f"{path} is not a valid MCTS store")
+        else:
+            self.num_slots = max(PROBES, (max_mb * 1024 * 1024 - HEADER.size) // SLOT.size)
+            self.generation = 0
+            size = HEADER.size + self.num_slots * SLOT.size
+            self.file = open(path, "w+b")
+            self.file.truncate(size)
+            self.mm = mmap.mmap(self.file.fileno(), size)
+            HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.num_slots, self.generation)
+
+    def _offset(self, i):
+        return HEADER.size + i * SLOT.size
+
+    def _aged(self, wins, visits, generation):
+        factor = self.decay ** (self.generation - generation)
+        return wins * factor, visits * factor
+
+    def _find(self, key):
+        # returns (slot index, found); when not found, index is the slot to (re)use
+        start = key % self.num_slots
+        victim, victim_visits = None, None
+        for p in range(PROBES):
+            i = (start + p) % self.num_slots
+            k, w, n, g = SLOT.unpack_from(self.mm, self._offset(i))
+            if k == key:
+                return i, True
+            if k == 0:
+                return i, False
+            # replace the entry with the fewest (aged) visits when the probe window is full
+            _, aged_n = self._aged(w, n, g)
+            if victim is None or aged_n < victim_visits:
+                victim, victim_visits = i, aged_n
+        return victim, False
+
+    def is_shallow(self, pos):
+        # keys of boards larger than the standard one may not fit the 64-bit slot
+        return pos.num_turns <= self.max_ply and pos.geometry.key_bits <= 64
+
+    # returns (wins, visits) prior for pos, or None
+    def get(self, pos):
+        if not self.is_shallow(pos):
+            return None
+        i, found = self._find(pos.key())
+        if not found:
+            return None
+        _, w, n, g = SLOT.unpack_from(self.mm, self._offset(i))
+        w, n = self._aged(w, n, g)
+        if n < 1.0:
+            return None
+        if n > self.max_prior_visits:
+            w, n = w * self.max_prior_visits / n, self.max_prior_visits
+        return w, n
+
+    def add(self, pos, wins, visits):
+        if visits <= 0 or not self.is_shallow(pos):
+            return
+        key = pos.key()
+        i, found = self._find(key)
+        if found:
+            _, w, n, g = SLOT.unpack_from(self.mm, self._offset(i))
+            w, n = self._aged(w, n, g)
+        else:
+            w, n = 0.0, 0.0
+        SLOT.pack_into(self.mm, self._offset(i), key, w + wins, n + visits, self.generation)
+
+    # write back the statistics gathered by one search (excluding the priors it was seeded with)
+    def commit(self, nodes, priors):
+        for pos, (w, n, _) in nodes.items():
+            prior_w, prior_n = priors.get(pos, (0.0, 0.0))
+            self.add(pos, w - prior_w, n - prior_n)
+        self.generation += 1
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.num_slots, self.generation)
+        self.mm.flush()
+
+    def __len__(self):
+        return sum(1 for i in range(self.num_slots) if SLOT.unpack_from(self.mm, self._offset(i))[0] != 0)
+
+    def close(self):
+        self.mm.flush()
+        self.mm.close()
+        self.file.close()
@@ -0,0 +1,122 @@
+from collections import namedtuple
+
+from connect4 import Position, STANDARD
+
+# Static threat analysis for the zugzwang endgame. Rows are counted from 1 at the bottom: the first
+# player ("White") profits from threats on odd rows, the second player ("Black") from threats on even
+# rows, since once the other columns are full the side to move is forced to play below them.
+#
+# Proofs (sound, from the side to move's view as bounds lower <= result <= upper, -1 loss, 0 draw, 1 win):
+# - a player whose stones plus all empty cells contain no line can never win
+# - claimeven: when every column holds an even number of stones, Black can answer every White move
+#   on top of it in the same column, so White ends up with exactly the empty odd-row cells and Black
+#   with the even-row cells. If that gives White no line, White cannot win; if it also gives Black
+#   a line, Black wins.
+# Otherwise `score` is a static estimate in [-1, 1] from the threats each side keeps:
+# - a threat is dead when the opponent has a threat lower in the same column (it is reached first)
+# - White with a live odd threat against no live Black even threat controls the zugzwang, and
+#   Black with a live even threat against no live White odd threat; both or neither is undecided
+ZUGZWANG_SCORE = 0.6  # score of the side controlling the zugzwang
+GOOD_THREAT_SCORE = 0.05  # per live threat on the row parity of its owner
+OTHER_THREAT_SCORE = 0.02  # per live threat on the other parity
+MAX_SCORE = 0.9  # static scores stay below proven results
+MIN_STONES = 16  # engines skip the analysis in earlier positions, where it rarely decides anything
+
+# own_odd ... other_even: live threat cells of the side to move and of the opponent, by row parity
+Analysis = namedtuple("Analysis", "lower upper score own_odd own_even other_odd other_even")
+
+_row_masks = {}
+
+def row_masks(geometry=STANDARD):
+    """(cells on odd rows, cells on even rows), rows counted from 1 at the bottom"""
+    masks = _row_masks.get(geometry)
+    if masks is None:
+        odd = sum(1 << (col * geometry.stride + row)
+                  for col in range(geometry.width) for row in range(0, geometry.height, 2))
+        masks = _row_masks[geometry] = (odd, geometry.full_mask ^ odd)
+    return masks
+
+def live_threats(threats, opponent_threats, geometry=STANDARD):
+    """Threat cells without an opponent threat below them in the same column"""
+    live = 0
+    for col_mask in geometry.column_masks:
+        column = threats & col_mask
+        if not column:
+            continue
+        below = opponent_threats & col_mask
+        if below:
+            lowest = below & -below
+            column &= lowest - 1
+        live |= column
+    return live
+
+def columns(cells, geometry=STANDARD):
+    """{column: [rows counted from 1]} of the cells in a mask"""
+    result = {}
+    for col in range(geometry.width):
+        for row in range(geometry.height):
+            if cells >> (col * geometry.stride + row) & 1:
+                result.setdefault(col, []).append(row + 1)
+    return result
+
+def analyze(own, other, geometry=STANDARD):
+    """Analysis of the position with stones own (side to move) and other (opponent)"""
+    mask = own | other
+    pos = Position(0, mask, own, geometry=geometry)
+    empty = geometry.full_mask ^ mask
+    odd_rows, even_rows = row_masks(geometry)
+    own_first = bin(mask).count("1") % 2 == 0
+
+    lower, upper = -1, 1
+    if not pos.connected_fast(own | empty):
+        upper = 0
+    if not pos.connected_fast(other | empty):
+        lower = 0
+    # every column even (then White is to move): adding the bottom bit of a column to its stones
+    # lands on an odd row or above the board; the pairs of empty cells need an even board height
+    if geometry.height % 2 == 0 and not (mask + geometry.bottom_mask) & even_rows:
+        if not pos.connected_fast(own | (empty & odd_rows)):
+            upper = min(upper, 0)
+            if pos.connected_fast(other | (empty & even_rows)):
+                upper = lower = -1
+
+    own_threats = pos.winning_mask(own)
+    other_threats = pos.winning_mask(other)
+    own_live = live_threats(own_threats, other_threats, geometry)
+    other_live = live_threats(other_threats, own_threats, geometry)
+    own_good, own_bad = (odd_rows, even_rows) if own_first else (even_rows, odd_rows)
+    good = own_live & own_good
+    other_good = other_live & own_bad
+    if good and not other_good:
+        score = ZUGZWANG_SCORE
+    elif other_good and not good:
+        score = -ZUGZWANG_SCORE
+    else:
+        score = 0.0
+    score += GOOD_THREAT_SCORE * (bin(good).count("1") - bin(other_good).count("1"))
+    score += OTHER_THREAT_SCORE * (bin(own_live & own_bad).count("1") - bin(other_live & own_good).count("1"))
+    score = max(-MAX_SCORE, min(MAX_SCORE, score))
+    score = max(lower, min(upper, score))
+    return Analysis(lower, upper, score, own_live & odd_rows, own_live & even_rows,
+                    other_live & odd_rows, other_live & even_rows)
+
+def analyze_position(pos):
+    return analyze(pos.position, pos.position ^ pos.mask, pos.geometry)
+
+def evaluate(pos):
+    # value in [-1, 1] from player 0's point of view (proven result or static score), for evaluate.cutoff_playout
+    if pos.terminal:
+        return float(pos.result)
+    analysis = analyze_position(pos)
+    value = analysis.lower if analysis.lower == analysis.upper else analysis.score
+    return float(value) if pos.turn == 0 else -float(value)
+
+def proven_playout(playout, min_stones=MIN_STONES):
+    # playout policy (see mcts.get_nodes) that returns the proven result instead of simulating when there is one
+    def play(pos, played=None):
+        if pos.num_turns >= min_stones and not pos.terminal:
+            analysis = analyze_position(pos)
+            if analysis.lower == analysis.upper:
+                return float(analysis.lower) if pos.turn == 0 else -float(analysis.lower)
+        return playout(pos, played)
+    return play
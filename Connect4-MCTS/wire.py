@@ -0,0 +1,69 @@
+import json
+import math
+
+from connect4 import Position, STANDARD
+
+# Compact request format for /api/connect4-move, sent with Content-Type CONTENT_TYPE instead of JSON.
+#
+# body:     <position>[;<engine>] in ASCII, e.g. "3342" or "3342;mcts"
+# position: the columns played from the empty board ("" for the empty board), the first player
+#           uses piece value 1; or "<stones>:<mask>", two hexadecimal bitboards (connect4.Position
+#           layout, 7 bits per column) of the side to move's stones and of all stones, the side to
+#           move being player 1 when the number of stones is even
+# The valid moves are the legal moves of the position. Responses are the usual AIResponse JSON.
+CONTENT_TYPE = "application/x-connect4"
+RESPONSE_FIELDS = ("move", "evaluation", "depth", "execution_time", "source")
+
+# strict JSON: NaN and infinities raise instead of being written as the non-standard NaN/Infinity
+_encoder = json.JSONEncoder(separators=(",", ":"), allow_nan=False)
+
+def json_dumps(obj) -> bytes:
+    return _encoder.encode(obj).encode()
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    dumps = json_dumps
+
+def decode_request(body: bytes):
+    """(position, moves or None, engine or None) of a compact request; ValueError if malformed, illegal
+    or finished"""
+    text = body.decode("ascii").strip()
+    text, _, engine = text.partition(";")
+    if ":" in text:
+        stones, _, mask = text.partition(":")
+        position, mask = int(stones, 16), int(mask, 16)
+        # stones inside the board, on occupied cells, and every column filled from the bottom
+        # (then adding the bottom bit of a column only sets the cell above its stones)
+        if mask & ~STANDARD.full_mask or position & ~mask or mask & (mask + STANDARD.bottom_mask):
+            raise ValueError("Invalid bitboards")
+        num_turns = bin(mask).count("1")
+        # players alternate from player 1, so the side to move has half of the stones (rounded down)
+        if bin(position).count("1") != num_turns // 2:
+            raise ValueError("Invalid bitboards")
+        pos = Position(num_turns % 2, mask, position, num_turns)
+        pos.game_over()
+        # a four of the side to move means the game ended before its opponent's last move
+        if pos.connected_fast(position):
+            raise ValueError("Invalid bitboards")
+        moves = None
+    else:
+        moves = [int(c) for c in text]
+        pos = Position(0)
+        for col in moves:
+            if col not in pos.legal_moves() or pos.terminal:
+                raise ValueError(f"Illegal move {col}")
+            pos = pos.move(col)
+    if pos.terminal:
+        raise ValueError("Game is over")
+    return pos, moves, engine or None
+
+def encode_response(response) -> bytes:
+    fields = {field: getattr(response, field) for field in RESPONSE_FIELDS}
+    # minimax reports -inf when it completes no depth; JSON has no infinity
+    if fields["evaluation"] is not None and not math.isfinite(fields["evaluation"]):
+        fields["evaluation"] = None
+    return dumps(fields)
@@ -3,10 +3,28 @@ import uvicorn
 from pydantic import BaseModel
 from typing import List, Optional, Tuple, Dict
 from fastapi.middleware.cors import CORSMiddleware
+import hashlib
 import math
+import numpy as np
 import time
 import random
 from functools import lru_cache
+import queue
+import atexit
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+import os
+import sys
+import threading
+
+# Shared helpers (bitboard keys, move cache) live in Connect4-MCTS/ next to the MCTS engine
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+from connect4 import Position, get_geometry
+from move_cache import MoveCache
+from ntuple import NTupleNetwork
+import params
+import threats
 
 app = FastAPI()
 
@@ -22,15 +40,44 @@ app.add_middleware(
 ROWS = 6
 COLS = 7
 WIN_LENGTH = 4
-MAX_DEPTH = 8  # Increased for better lookahead
+MAX_DEPTH = 8  # Increased for better lookahead (single process; with Lazy SMP the time limit bounds the depth)
 TIME_LIMIT = 3  # Seconds to ensure we respond within 5s limit
+TACTICAL_ORDERING = False  # Use the full tactical scan of order_moves instead of killer/history ordering
+MAX_KILLERS = 2  # Killer moves remembered per ply
+USE_PVS = True  # Principal Variation Search: null-window searches for non-PV moves
+USE_ASPIRATION = True  # Iterative deepening starts each depth with a window around the previous score
+ASPIRATION_WINDOW = 200  # Half-width of the aspiration window
+
+SMP_WORKERS = 0  # Lazy SMP helper processes searching alongside the main search (0 = single process)
+SMP_TABLE_MB = 16  # Size of the shared transposition table used by Lazy SMP
+# Host-wide transposition table shared by every search process (uvicorn workers, SMP helpers) via /dev/shm
+HOST_TT_MB = int(os.environ.get("CONNECT4_TT_MB", "0"))  # Size of the table (0 = per-process table)
+HOST_TT_NAME = os.environ.get("CONNECT4_TT_NAME", "connect4_tt")  # Segment name prefix, see host_table_name
+MOVE_CACHE_SIZE = 4096  # Results kept for repeated positions across requests (0 = no cache)
+MOVE_CACHE_TTL = 600  # Seconds a cached result stays valid
+NTUPLE_PATH = os.environ.get("CONNECT4_NTUPLE")  # n-tuple network (train_ntuple.py) scoring leaves instead of the windows
+NTUPLE_SCALE = 2000  # Evaluation units of a network value of 1
+USE_THREAT_ANALYSIS = True  # Odd/even threat analysis (Connect4-MCTS/threats.py): proven bounds cut off the search
+THREAT_MIN_PIECES = threats.MIN_STONES  # Pieces on the board before the analysis runs
+# Remaining depth from which nodes run the analysis (0 = every node, leaves add its score). At 0.5s per
+# position of tactics_suite.jsonl, every node solves 280/300 against 262 from depth 2 and 264 without it
+THREAT_MIN_DEPTH = 0
+THREAT_WEIGHT = 2000  # Evaluation units of a threat score of 1, added to the leaf evaluation
+THREAT_CACHE_SIZE = 200000  # Analyses kept by position key, the cache is emptied when full
+
+# Transposition table bound types
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
 
 # Define key pattern values for faster evaluation
+# (overridden by the "minimax" section of the tuned parameter file, see Connect4-MCTS/params.py and tune.py)
+_tuned = params.load("minimax")
 FOUR_IN_ROW = 100000000
-THREE_IN_ROW = 1000
-TWO_IN_ROW = 100
-BLOCK_THREE = 1200
-BLOCK_TWO = 100
+THREE_IN_ROW = _tuned.get("THREE_IN_ROW", 1000)
+TWO_IN_ROW = _tuned.get("TWO_IN_ROW", 100)
+BLOCK_THREE = _tuned.get("BLOCK_THREE", 1200)
+BLOCK_TWO = _tuned.get("BLOCK_TWO", 100)
 
 class GameState(BaseModel):
     board: List[List[int]]
@@ -46,7 +93,19 @@ class AIResponse(BaseModel):
 class Connect4AI:
     # Cache for lines and transposition table
     _cached_winning_lines: Optional[List[List[Tuple[int, int]]]] = None
-    _transposition_table: Dict[str, Tuple[int, int, int, bool]] = {}  # hash -> (score, depth, move, is_exact)
+    _transposition_table: Dict[int, Tuple[int, int, int, int]] = {}  # Zobrist key -> (score, depth, move, bound)
+    _killer_moves: Dict[int, List[int]] = {}  # ply -> columns that caused a beta cutoff
+    _history_table: Dict[Tuple[int, int, int], int] = {}  # (player, row, col) -> cutoff bonus
+    _node_count: int = 0  # Nodes visited by the last search (for benchmarking)
+    _order_rng: Optional[random.Random] = None  # Set in Lazy SMP helpers to perturb move order
+    _stopped_search = None  # Set in Lazy SMP helpers: shared id of the last search the main process finished
+    _search_id: int = 0  # Search a Lazy SMP helper is running; it aborts once _stopped_search reaches it
+    _smp_pool: Optional["LazySMPPool"] = None
+    _host_table: Optional["SharedTranspositionTable"] = None  # Set when the host-wide table is in use
+    _host_table_config: Optional[Tuple[int, str]] = None  # (size in MB, name prefix) given to use_host_table
+    _batch_tables: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None  # See evaluate_positions
+    _ntuple: Optional[NTupleNetwork] = None  # Set by use_ntuple
+    _threat_cache: Dict[int, "threats.Analysis"] = {}  # Zobrist key -> threats.analyze result, see threat_analysis
     
     @staticmethod
     def board_hash(board: List[List[int]]) -> str:
@@ -81,7 +140,7 @@ class Connect4AI:
 
     @staticmethod
     def evaluate_window(window: List[int], player: int) -> int:
-        """Evaluate a window of 4 positions"""
+        """Evaluate a window of WIN_LENGTH positions"""
         opponent = 3 - player
         player_count = window.count(player)
         opponent_count = window.count(opponent)
@@ -92,21 +151,21 @@ class Connect4AI:
             return 0
             
         # Player pieces evaluation
-        if player_count == 4:
+        if player_count == WIN_LENGTH:
             return FOUR_IN_ROW
-        elif player_count == 3 and empty_count == 1:
+        elif player_count == WIN_LENGTH - 1 and empty_count == 1:
             return THREE_IN_ROW
-        elif player_count == 2 and empty_count == 2:
+        elif player_count == WIN_LENGTH - 2 and empty_count == 2:
             return TWO_IN_ROW
-        elif player_count == 1 and empty_count == 3:
+        elif player_count == WIN_LENGTH - 3 and empty_count == 3:
             return 1
             
         # Opponent pieces evaluation (negative scores)
-        if opponent_count == 3 and empty_count == 1:
+        if opponent_count == WIN_LENGTH - 1 and empty_count == 1:
             return -BLOCK_THREE  # Critical to block
-        elif opponent_count == 2 and empty_count == 2:
+        elif opponent_count == WIN_LENGTH - 2 and empty_count == 2:
             return -BLOCK_TWO
-        elif opponent_count == 1 and empty_count == 3:
+        elif opponent_count == WIN_LENGTH - 3 and empty_count == 3:
             return -1
             
         return 0
@@ -162,35 +221,65 @@ class Connect4AI:
         
         return score
 
+    @staticmethod
+    def _get_batch_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(flat cell indices of every winning line, evaluate_window score by (own, opponent) count,
+        center/height bonus per flat cell)"""
+        if Connect4AI._batch_tables is None:
+            lines = np.array([[r * COLS + c for r, c in line] for line in Connect4AI.get_winning_lines()])
+            window_values = np.zeros((WIN_LENGTH + 1, WIN_LENGTH + 1), dtype=np.int64)
+            for own in range(WIN_LENGTH + 1):
+                for other in range(WIN_LENGTH + 1 - own):
+                    window = [1] * own + [2] * other + [0] * (WIN_LENGTH - own - other)
+                    window_values[own, other] = Connect4AI.evaluate_window(window, 1)
+            center_col = COLS // 2
+            cell_values = np.array([
+                (3 if c == center_col else 0) + (3 - min(3, abs(c - center_col))) * 5 + (ROWS - r) * 3
+                for r in range(ROWS) for c in range(COLS)
+            ], dtype=np.int64)
+            Connect4AI._batch_tables = (lines, window_values, cell_values)
+        return Connect4AI._batch_tables
+
+    @staticmethod
+    def evaluate_positions(boards: List[List[List[int]]], player: int) -> List[int]:
+        """evaluate_position for many boards (e.g. all children of a node) in one vectorized pass"""
+        lines, window_values, cell_values = Connect4AI._get_batch_tables()
+        cells = np.asarray(boards, dtype=np.int8)
+        own = cells == player
+        flat_own = own.reshape(len(boards), -1)
+        flat_other = (cells == 3 - player).reshape(len(boards), -1)
+
+        # Windows: look up every line's score by its (own, opponent) piece counts
+        own_counts = flat_own[:, lines].sum(axis=2)
+        other_counts = flat_other[:, lines].sum(axis=2)
+        scores = window_values[own_counts, other_counts].sum(axis=1)
+
+        # Center column, center distance and height of own pieces
+        scores += flat_own.astype(np.int64) @ cell_values
+
+        # Adjacent own pieces: both pieces of a pair score it, except vertically (only the upper one)
+        scores += 6 * (own[:, :, 1:] & own[:, :, :-1]).sum(axis=(1, 2))
+        scores += 5 * (own[:, 1:, :] & own[:, :-1, :]).sum(axis=(1, 2))
+        scores += 4 * (own[:, 1:, 1:] & own[:, :-1, :-1]).sum(axis=(1, 2))
+        scores += 4 * (own[:, 1:, :-1] & own[:, :-1, 1:]).sum(axis=(1, 2))
+        return scores.tolist()
+
     @staticmethod
     def check_winner(board: List[List[int]]) -> int:
         """Determine if there's a winner on the board"""
         winning_lines = Connect4AI.get_winning_lines()
         for line in winning_lines:
             values = [board[r][c] for r, c in line]
-            if values[0] != 0 and values.count(values[0]) == 4:
+            if values[0] != 0 and values.count(values[0]) == WIN_LENGTH:
                 return values[0]
         return 0
 
     @staticmethod
     def detect_threats(board: List[List[int]], player: int) -> List[int]:
         """Detect columns that represent immediate threats (win next move)"""
-        threat_columns = []
-    
-    # Iterate over all columns to check if they are valid for a move
-        for col in range(COLS):
-            # Skip if column is full
-            if board[0][col] != 0:
-                continue
-                
-            # Simulate the move for the current player in this column
-            new_board, row = Connect4AI.make_move(board, col, player)
-            
-            # Check if the current move creates a winning position
-            if Connect4AI.check_winner(new_board) == player:
-                threat_columns.append(col)
-                
-        return threat_columns
+        # Bitboard threat mask of the player's cells instead of trying every column
+        pos = Position.from_board(board, player, WIN_LENGTH)
+        return pos.columns(pos.own_winning_mask())
     @staticmethod
     def is_board_full(board: List[List[int]]) -> bool:
         """Check if board is full (draw)"""
@@ -242,6 +331,12 @@ class Connect4AI:
         # Then check for opponent winning moves to block
         blocking_moves = Connect4AI.detect_threats(board, 3 - player)
         
+        # Evaluate every child position in one batch
+        children = {col: Connect4AI.make_move(board, col, player) for col in valid_moves}
+        playable = [col for col in valid_moves if children[col][1] != -1]
+        evaluations = dict(zip(playable, Connect4AI.evaluate_positions(
+            [children[col][0] for col in playable], player))) if playable else {}
+
         # Score moves based on position and potential
         for col in valid_moves:
             score = 0
@@ -255,10 +350,10 @@ class Connect4AI:
             score += (4 - min(3, abs(col - center_preference))) * 10
             
             # Check if move leads to good position
-            new_board, row = Connect4AI.make_move(board, col, player)
+            new_board, row = children[col]
             if row != -1:
                 # Small sample evaluation
-                score += Connect4AI.evaluate_position(new_board, player) // 1000
+                score += evaluations[col] // 1000
                 
                 # Avoid moves that give opponent winning moves
                 opponent_threats = Connect4AI.detect_threats(new_board, 3 - player)
@@ -280,32 +375,106 @@ class Connect4AI:
         move_scores.sort(reverse=True, key=lambda x: x[0])
         return [col for _, col in move_scores]
 
+    @staticmethod
+    def order_moves_fast(board: List[List[int]], valid_moves: List[int], player: int,
+                         tt_move: Optional[int], ply: int) -> List[int]:
+        """Cheap move ordering: TT/PV move, killer moves, history table, then center preference"""
+        killers = Connect4AI._killer_moves.get(ply, [])
+        center_col = COLS // 2
+        rng = Connect4AI._order_rng
+
+        def move_key(col: int) -> Tuple[int, int, int, int]:
+            row = Connect4AI.get_next_open_row(board, col)
+            killer_rank = MAX_KILLERS - killers.index(col) if col in killers else 0
+            return (
+                col == tt_move,
+                killer_rank,
+                Connect4AI._history_table.get((player, row, col), 0),
+                -abs(col - center_col) + (rng.random() * 2 if rng is not None else 0),
+            )
+
+        return sorted(valid_moves, key=move_key, reverse=True)
+
+    @staticmethod
+    def record_cutoff(board: List[List[int]], col: int, player: int, depth: int, ply: int) -> None:
+        """Update killer moves and history table after a beta cutoff"""
+        killers = Connect4AI._killer_moves.setdefault(ply, [])
+        if col in killers:
+            killers.remove(col)
+        killers.insert(0, col)
+        del killers[MAX_KILLERS:]
+
+        row = Connect4AI.get_next_open_row(board, col)
+        key = (player, row, col)
+        Connect4AI._history_table[key] = Connect4AI._history_table.get(key, 0) + depth * depth
+
     @staticmethod
     def negamax_alpha_beta(board: List[List[int]], depth: int, alpha: float, beta: float, 
-                          player: int, start_time: float, time_limit: float) -> Tuple[int, Optional[int]]:
-        """Negamax with alpha-beta pruning and time management"""
+                          player: int, start_time: float, time_limit: float,
+                          ply: int = 0, evaluator: Optional["IncrementalEvaluator"] = None) -> Tuple[int, Optional[int]]:
+        """Negamax with alpha-beta pruning and time management.
+
+        With an evaluator, board must be evaluator.board: moves are made and taken back
+        in place and leaves are scored incrementally.
+        """
         # Check if we're running out of time
         if time.time() - start_time > time_limit:
             return None, None  # Signal we need to stop search
+        Connect4AI._node_count += 1
+        if Connect4AI._stopped_search is not None and Connect4AI._node_count % 1024 == 0 \
+                and Connect4AI._stopped_search.value >= Connect4AI._search_id:
+            return None, None
             
-        # Check transposition table
-        board_key = Connect4AI.board_hash(board)
-        if board_key in Connect4AI._transposition_table:
-            score, stored_depth, move, is_exact = Connect4AI._transposition_table[board_key]
-            if stored_depth >= depth and is_exact:
+        # Check transposition table (integer keys on both paths, as the shared tables store)
+        if evaluator is not None:
+            board_key = evaluator.key ^ IncrementalEvaluator.ZOBRIST_SIDE[player]
+        else:
+            board_key = IncrementalEvaluator.board_key(board) ^ IncrementalEvaluator.ZOBRIST_SIDE[player]
+        tt_move = None
+        entry = Connect4AI._transposition_table.get(board_key)
+        if entry is not None:
+            score, stored_depth, move, bound = entry
+            if stored_depth >= depth and (
+                bound == EXACT
+                or (bound == LOWER_BOUND and score >= beta)
+                or (bound == UPPER_BOUND and score <= alpha)
+            ):
                 return score, move
+            tt_move = move  # Best move from a shallower search is tried first
         
         # Check for terminal states
-        winner = Connect4AI.check_winner(board)
+        if evaluator is not None:
+            winner = evaluator.winner()
+            is_full = evaluator.is_full()
+        else:
+            winner = Connect4AI.check_winner(board)
+            is_full = Connect4AI.is_board_full(board)
         if winner == player:
             return FOUR_IN_ROW, None
         elif winner == 3 - player:
             return -FOUR_IN_ROW, None
-        elif Connect4AI.is_board_full(board):
+        elif is_full:
             return 0, None
+
+        # Threat analysis: a proven result, or bounds that already decide this node (not at the root,
+        # which needs a move); a proven win scores below an immediate one but still ends the deepening
+        analysis = None
+        if USE_THREAT_ANALYSIS and evaluator is not None and depth >= THREAT_MIN_DEPTH \
+                and evaluator.pieces >= THREAT_MIN_PIECES:
+            analysis = Connect4AI.threat_analysis(evaluator, player, board_key)
+            if ply > 0:
+                lower, upper = analysis.lower * (FOUR_IN_ROW // 2), analysis.upper * (FOUR_IN_ROW // 2)
+                if lower == upper or lower >= beta:
+                    return lower, None
+                if upper <= alpha:
+                    return upper, None
         
         # Depth limit reached
         if depth == 0:
+            if evaluator is not None:
+                if analysis is not None:
+                    return evaluator.evaluate(player) + int(analysis.score * THREAT_WEIGHT), None
+                return evaluator.evaluate(player), None
             eval_score = Connect4AI.evaluate_position(board, player)
             return eval_score, None
             
@@ -314,21 +483,43 @@ class Connect4AI:
             return 0, None
             
         # Order moves for better pruning
-        ordered_moves = Connect4AI.order_moves(board, valid_moves, player)
+        if TACTICAL_ORDERING:
+            ordered_moves = Connect4AI.order_moves(board, valid_moves, player)
+        else:
+            ordered_moves = Connect4AI.order_moves_fast(board, valid_moves, player, tt_move, ply)
         
+        alpha_orig = alpha
         best_value = -math.inf
         best_move = ordered_moves[0]  # Default to first move
+        searched_moves = 0
         
         # Try each move
         for col in ordered_moves:
-            new_board, row = Connect4AI.make_move(board, col, player)
+            if evaluator is not None:
+                row = evaluator.play(col, player)
+                new_board = board
+            else:
+                new_board, row = Connect4AI.make_move(board, col, player)
             if row == -1:
                 continue
                 
             # Opponent's turn (negative of opponent's best score)
-            value, _ = Connect4AI.negamax_alpha_beta(
-                new_board, depth-1, -beta, -alpha, 3 - player, start_time, time_limit
-            )
+            if USE_PVS and searched_moves > 0:
+                # Null-window search proves the move is no better than alpha; re-search if it fails high
+                value, _ = Connect4AI.negamax_alpha_beta(
+                    new_board, depth-1, -alpha-1, -alpha, 3 - player, start_time, time_limit, ply + 1, evaluator
+                )
+                if value is not None and alpha < -value < beta:
+                    value, _ = Connect4AI.negamax_alpha_beta(
+                        new_board, depth-1, -beta, -alpha, 3 - player, start_time, time_limit, ply + 1, evaluator
+                    )
+            else:
+                value, _ = Connect4AI.negamax_alpha_beta(
+                    new_board, depth-1, -beta, -alpha, 3 - player, start_time, time_limit, ply + 1, evaluator
+                )
+            searched_moves += 1
+            if evaluator is not None:
+                evaluator.undo(row, col)
             
             # Check if search was aborted due to time
             if value is None:
@@ -342,25 +533,48 @@ class Connect4AI:
                 
             alpha = max(alpha, best_value)
             if alpha >= beta:
+                Connect4AI.record_cutoff(board, col, player, depth, ply)
                 break  # Beta cutoff
         
-        # Store in transposition table
-        Connect4AI._transposition_table[board_key] = (best_value, depth, best_move, True)
+        # Store in transposition table (scores outside the window are only bounds)
+        if best_value <= alpha_orig:
+            bound = UPPER_BOUND
+        elif best_value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        Connect4AI._transposition_table[board_key] = (best_value, depth, best_move, bound)
         return best_value, best_move
 
     @staticmethod
-    def find_best_move(board: List[List[int]], player: int, valid_moves: List[int]) -> Tuple[int, int, int, float]:
-        """Find best move using iterative deepening with time control"""
+    def threat_analysis(evaluator: "IncrementalEvaluator", player: int, key: int) -> "threats.Analysis":
+        """threats.analyze of the evaluator's position with player to move, cached by its transposition key
+        (the analysis depends on the stones only, so entries stay valid across searches)"""
+        cache = Connect4AI._threat_cache
+        analysis = cache.get(key)
+        if analysis is None:
+            if len(cache) >= THREAT_CACHE_SIZE:
+                cache.clear()
+            analysis = cache[key] = threats.analyze(evaluator.stones[player], evaluator.stones[3 - player],
+                                                    get_geometry(COLS, ROWS, WIN_LENGTH))
+        return analysis
+
+    @staticmethod
+    def find_best_move(board: List[List[int]], player: int, valid_moves: List[int],
+                       time_limit: Optional[float] = None, on_depth=None) -> Tuple[int, int, int, float]:
+        """Find best move using iterative deepening with time control (TIME_LIMIT unless time_limit is given)"""
         if not valid_moves:
             raise ValueError("No valid moves available")
             
         start_time = time.time()
-        best_move = valid_moves[0]  # Default to first valid move
-        best_score = -math.inf
-        max_depth_reached = 0
         
-        # Clear transposition table for new search
-        Connect4AI._transposition_table.clear()
+        # Clear transposition table and ordering heuristics for new search
+        # (entries of the host-wide table stay valid and are shared with other processes)
+        if Connect4AI._host_table is None:
+            Connect4AI._transposition_table.clear()
+        Connect4AI._killer_moves.clear()
+        Connect4AI._history_table.clear()
+        Connect4AI._node_count = 0
         
         # First check immediate threats
         
@@ -378,13 +592,68 @@ class Connect4AI:
             opponent_threats.sort(key=lambda c: abs(c - COLS//2))
             return opponent_threats[0], -BLOCK_THREE, 1, time.time() - start_time
         
+        # Lazy SMP: helpers search the same position and share the transposition table.
+        # Only the time limit bounds the depth: under MAX_DEPTH the main search finishes the
+        # last depth early and the helpers only repeat depths it already has
+        pool = None
+        max_depth = None
+        if SMP_WORKERS > 0:
+            max_depth = ROWS * COLS - sum(cell != 0 for row in board for cell in row)
+            pool = Connect4AI.get_smp_pool()
+            pool.start_search(board, player, start_time, TIME_LIMIT if time_limit is None else time_limit, max_depth)
+
+        best_move, best_score, max_depth_reached = Connect4AI.iterative_deepening(
+            board, player, valid_moves, start_time, time_limit=time_limit, on_depth=on_depth, max_depth=max_depth
+        )
+
+        # Report the deepest completed result among the main search and the helpers
+        if pool is not None:
+            for depth, move, score in pool.finish_search():
+                if depth > max_depth_reached and move in valid_moves:
+                    best_move, best_score, max_depth_reached = move, score, depth
+        
+        return best_move, best_score, max_depth_reached, time.time() - start_time
+
+    @staticmethod
+    def iterative_deepening(board: List[List[int]], player: int, valid_moves: List[int], start_time: float,
+                            first_depth: int = 1, on_depth=None, time_limit: Optional[float] = None,
+                            max_depth: Optional[int] = None) -> Tuple[int, int, int]:
+        """Iterative deepening from first_depth to max_depth (MAX_DEPTH unless given);
+        on_depth(depth, move, score) is called after each completed depth"""
+        if time_limit is None:
+            time_limit = TIME_LIMIT
+        if max_depth is None:
+            max_depth = MAX_DEPTH
+        best_move = valid_moves[0]  # Default to first valid move
+        best_score = -math.inf
+        max_depth_reached = 0
+
         # Use iterative deepening to find best move within time limit
-        for depth in range(1, MAX_DEPTH + 1):
+        evaluator = IncrementalEvaluator(board)
+        depth_scores: List[int] = []  # Completed score per depth
+        for depth in range(first_depth, max_depth + 1):
             try:
-                score, move = Connect4AI.negamax_alpha_beta(
-                    board, depth, -math.inf, math.inf, player, 
-                    start_time, TIME_LIMIT * 0.9  # Use 90% of time limit
-                )
+                # Aspiration window around the score of the last iteration with the same horizon parity
+                # (scores alternate between odd and even depths); not around win scores
+                guess = depth_scores[-2] if len(depth_scores) >= 2 else None
+                if USE_ASPIRATION and guess is not None and abs(guess) < FOUR_IN_ROW // 2:
+                    alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+                else:
+                    alpha, beta = -math.inf, math.inf
+
+                while True:
+                    score, move = Connect4AI.negamax_alpha_beta(
+                        evaluator.board, depth, alpha, beta, player, 
+                        start_time, time_limit * 0.9,  # Use 90% of time limit
+                        evaluator=evaluator
+                    )
+                    # Re-search with the failed side opened up
+                    if score is not None and score <= alpha:
+                        alpha = -math.inf
+                    elif score is not None and score >= beta:
+                        beta = math.inf
+                    else:
+                        break
                 
                 # Check if search was aborted due to time
                 if score is None:
@@ -395,6 +664,9 @@ class Connect4AI:
                     best_move = move
                     best_score = score
                     max_depth_reached = depth
+                    depth_scores.append(score)
+                    if on_depth is not None:
+                        on_depth(depth, move, score)
                     
                 # If we found a winning move, no need to search deeper
                 if best_score >= FOUR_IN_ROW // 2:
@@ -405,13 +677,392 @@ class Connect4AI:
                 break
                 
             # Break if we're getting close to time limit
-            if time.time() - start_time > TIME_LIMIT * 0.8:
+            if time.time() - start_time > time_limit * 0.8:
                 break
         
-        return best_move, best_score, max_depth_reached, time.time() - start_time
+        return best_move, best_score, max_depth_reached
+
+    @staticmethod
+    def get_smp_pool() -> "LazySMPPool":
+        """Start the Lazy SMP helpers on first use; the shared table replaces the local one"""
+        if Connect4AI._smp_pool is None:
+            Connect4AI._smp_pool = LazySMPPool(SMP_WORKERS, SMP_TABLE_MB, Connect4AI._host_table)
+            atexit.register(Connect4AI._smp_pool.close)
+            Connect4AI._transposition_table = Connect4AI._smp_pool.table
+        return Connect4AI._smp_pool
+
+class IncrementalEvaluator:
+    """Board whose evaluate_position() score is updated on every play/undo instead of rescanned"""
+    _cell_lines: Optional[List[List[List[int]]]] = None  # [row][col] -> indices of winning lines through the cell
+    _line_values: Dict[Tuple[int, int], int] = {}  # (player count, opponent count) -> evaluate_window score
+    _cell_values: List[List[int]] = []  # [row][col] -> center/height bonus for a piece on the cell
+    _zobrist: List[List[List[int]]] = []  # [player][row][col] -> random 64-bit key, same in every process
+    ZOBRIST_EMPTY = 0x9E3779B97F4A7C15  # Key of the empty board (non-zero so it never matches an empty slot)
+    ZOBRIST_SIDE = [0, 0, 0x5851F42D4C957F2D]  # [player to move] -> key mixed in, as scores are relative to the mover
+    # (row offset, col offset, bonus for the pair): both cells of a pair count their neighbour
+    # in evaluate_position, except vertically where only the upper piece counts the one below
+    _neighbours = [(0, -1, 6), (0, 1, 6), (1, 0, 5), (-1, 0, 5),
+                   (-1, -1, 4), (-1, 1, 4), (1, -1, 4), (1, 1, 4)]
+
+    def __init__(self, board: List[List[int]]):
+        IncrementalEvaluator._build_tables()
+        self.board = [[0] * COLS for _ in range(ROWS)]
+        self.line_counts = [[0, 0, 0] for _ in Connect4AI.get_winning_lines()]  # indexed by player 1/2
+        self.scores = [0, 0, 0]  # evaluate_position score from each player's point of view
+        self.completed_lines = [0, 0, 0]
+        self.pieces = 0
+        self.stones = [0, 0, 0]  # Bitboard of each player in the connect4.Position layout, for the n-tuple network
+        self.key = IncrementalEvaluator.ZOBRIST_EMPTY
+        for r in range(ROWS):
+            for c in range(COLS):
+                if board[r][c] != 0:
+                    self._update(r, c, board[r][c], 1)
+                    self.board[r][c] = board[r][c]
+
+    @staticmethod
+    def _build_tables() -> None:
+        if IncrementalEvaluator._cell_lines is not None:
+            return
+        winning_lines = Connect4AI.get_winning_lines()
+        cell_lines = [[[] for _ in range(COLS)] for _ in range(ROWS)]
+        for i, line in enumerate(winning_lines):
+            for r, c in line:
+                cell_lines[r][c].append(i)
+
+        for own in range(WIN_LENGTH + 1):
+            for other in range(WIN_LENGTH + 1 - own):
+                window = [1] * own + [2] * other + [0] * (WIN_LENGTH - own - other)
+                IncrementalEvaluator._line_values[(own, other)] = Connect4AI.evaluate_window(window, 1)
+
+        center_col = COLS // 2
+        IncrementalEvaluator._cell_values = [
+            [(3 if c == center_col else 0) + (3 - min(3, abs(c - center_col))) * 5 + (ROWS - r) * 3
+             for c in range(COLS)]
+            for r in range(ROWS)
+        ]
+        rng = random.Random(20240601)
+        IncrementalEvaluator._zobrist = [
+            [[rng.getrandbits(64) for _ in range(COLS)] for _ in range(ROWS)] for _ in range(3)
+        ]
+        IncrementalEvaluator._cell_lines = cell_lines
+
+    @staticmethod
+    def board_key(board: List[List[int]]) -> int:
+        """Zobrist key of a board, the same as IncrementalEvaluator(board).key"""
+        IncrementalEvaluator._build_tables()
+        key = IncrementalEvaluator.ZOBRIST_EMPTY
+        for r in range(ROWS):
+            for c in range(COLS):
+                if board[r][c] != 0:
+                    key ^= IncrementalEvaluator._zobrist[board[r][c]][r][c]
+        return key
+
+    def _update(self, r: int, c: int, player: int, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) a piece; the cell must be empty on the board while this runs"""
+        board = self.board
+        values = IncrementalEvaluator._line_values
+        delta = IncrementalEvaluator._cell_values[r][c]
+        for dr, dc, bonus in IncrementalEvaluator._neighbours:
+            rr, cc = r + dr, c + dc
+            if 0 <= rr < ROWS and 0 <= cc < COLS and board[rr][cc] == player:
+                delta += bonus
+        self.scores[player] += sign * delta
+
+        for i in IncrementalEvaluator._cell_lines[r][c]:
+            counts = self.line_counts[i]
+            before_1 = values[(counts[1], counts[2])]
+            before_2 = values[(counts[2], counts[1])]
+            if counts[player] == WIN_LENGTH and sign < 0:
+                self.completed_lines[player] -= 1
+            counts[player] += sign
+            if counts[player] == WIN_LENGTH:
+                self.completed_lines[player] += 1
+            self.scores[1] += values[(counts[1], counts[2])] - before_1
+            self.scores[2] += values[(counts[2], counts[1])] - before_2
+        self.pieces += sign
+        self.stones[player] ^= 1 << (c * (ROWS + 1) + ROWS - 1 - r)
+        self.key ^= IncrementalEvaluator._zobrist[player][r][c]
+
+    def play(self, col: int, player: int) -> int:
+        """Drop a piece and return its row (-1 if the column is full)"""
+        row = Connect4AI.get_next_open_row(self.board, col)
+        if row == -1:
+            return -1
+        self._update(row, col, player, 1)
+        self.board[row][col] = player
+        return row
+
+    def undo(self, row: int, col: int) -> None:
+        """Take back the piece played at (row, col)"""
+        player = self.board[row][col]
+        self.board[row][col] = 0
+        self._update(row, col, player, -1)
+
+    def evaluate(self, player: int) -> int:
+        """Same value as Connect4AI.evaluate_position(self.board, player), or the n-tuple network value if in use"""
+        if Connect4AI._ntuple is not None:
+            return int(Connect4AI._ntuple.value(self.stones[player], self.stones[3 - player]) * NTUPLE_SCALE)
+        return self.scores[player]
+
+    def winner(self) -> int:
+        if self.completed_lines[1]:
+            return 1
+        if self.completed_lines[2]:
+            return 2
+        return 0
+
+    def is_full(self) -> bool:
+        return self.pieces == ROWS * COLS
+
+class SharedTranspositionTable:
+    """Fixed-size transposition table in shared memory, readable and writable by every search process.
+
+    Each slot holds two 64-bit words, (key ^ data, data). Entries are written without locks;
+    a torn write fails the key check on read and is treated as a miss.
+    """
+
+    def __init__(self, size_mb: int, name: Optional[str] = None, host_wide: bool = False):
+        """A new private table (no name), an existing table by name, or with host_wide the named
+        table of the host, created with size_mb on first use and kept after every process exits"""
+        self.owner = False
+        self.closed = False
+        self.host_wide = host_wide
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size_mb * 1024 * 1024)
+            self.shm.buf[:] = bytes(self.shm.size)
+            self.owner = True
+        elif host_wide:
+            self.shm = SharedTranspositionTable._open_host_wide(name, size_mb)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast("Q")
+        self.num_slots = len(self.words) // 2
+
+    @staticmethod
+    def _open_host_wide(name: str, size_mb: int) -> shared_memory.SharedMemory:
+        for _ in range(50):
+            try:
+                if size_mb <= 0:
+                    raise FileExistsError  # Attach only (SMP helpers of a process that opened it)
+                # A new segment is zero-filled, i.e. all slots empty
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size_mb * 1024 * 1024)
+            except FileExistsError:
+                try:
+                    shm = shared_memory.SharedMemory(name=name)
+                except ValueError:
+                    time.sleep(0.01)  # Another process created it and has not sized it yet
+                    continue
+            # The table outlives this process: keep the resource tracker from unlinking it at exit
+            resource_tracker.unregister(shm._name, "shared_memory")
+            return shm
+        raise RuntimeError(f"Shared transposition table {name} is not usable")
+
+    @staticmethod
+    def _pack(score: int, depth: int, move: Optional[int], bound: int) -> int:
+        move_bits = COLS if move is None else move
+        return ((int(score) + (1 << 31)) << 32) | (depth << 8) | (move_bits << 4) | bound
+
+    @staticmethod
+    def _unpack(data: int) -> Tuple[int, int, Optional[int], int]:
+        move = (data >> 4) & 0xF
+        return (data >> 32) - (1 << 31), (data >> 8) & 0xFF, None if move == COLS else move, data & 0xF
+
+    def get(self, key: int) -> Optional[Tuple[int, int, Optional[int], int]]:
+        i = (key % self.num_slots) * 2
+        data = self.words[i + 1]
+        if self.words[i] ^ data != key:
+            return None
+        return SharedTranspositionTable._unpack(data)
+
+    def __setitem__(self, key: int, entry: Tuple[int, int, Optional[int], int]) -> None:
+        i = (key % self.num_slots) * 2
+        data = SharedTranspositionTable._pack(*entry)
+        self.words[i] = key ^ data
+        self.words[i + 1] = data
+
+    def clear(self) -> None:
+        self.shm.buf[:] = bytes(self.shm.size)
+
+    def close(self) -> None:
+        """Detach (and remove a private table); safe to call more than once"""
+        if self.closed:
+            return
+        self.closed = True
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _smp_helper(table_name: str, host_wide: bool, tasks, results, stopped) -> None:
+    """Lazy SMP helper process: runs the same iterative deepening on every position it is sent.
+
+    Results are (search id, "depth", (depth, move, score)) per completed depth, then
+    (search id, "done", nodes) once the helper has stopped searching that position.
+    """
+    Connect4AI._transposition_table = SharedTranspositionTable(0, name=table_name, host_wide=host_wide)
+    Connect4AI._stopped_search = stopped
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        search_id, board, player, worker, start_time, time_limit, max_depth = task
+        Connect4AI._search_id = search_id
+        Connect4AI._node_count = 0
+        Connect4AI._killer_moves.clear()
+        Connect4AI._history_table.clear()
+        Connect4AI._order_rng = random.Random(search_id * 1000 + worker)
+        valid_moves = Connect4AI.get_valid_moves(board)
+        # Odd helpers skip depth 1 so helpers are spread over different depths
+        Connect4AI.iterative_deepening(
+            board, player, valid_moves, start_time, first_depth=1 + worker % 2,
+            on_depth=lambda depth, move, score: results.put((search_id, "depth", (depth, move, score))),
+            time_limit=time_limit, max_depth=max_depth,
+        )
+        results.put((search_id, "done", Connect4AI._node_count))
+
+class LazySMPPool:
+    """Helper processes for Lazy SMP, started once and reused for every search"""
+
+    def __init__(self, workers: int, table_mb: int, table: Optional[SharedTranspositionTable] = None):
+        """Helpers share table when given (the host-wide table), otherwise a new table of table_mb"""
+        self.owns_table = table is None
+        self.table = table if table is not None else SharedTranspositionTable(table_mb)
+        self.results = multiprocessing.Queue()
+        # Id of the last finished search: helpers stop a search once it is reached, however late they check
+        self.stopped = multiprocessing.Value("q", 0, lock=False)
+        self.tasks = [multiprocessing.Queue() for _ in range(workers)]
+        self.search_id = 0
+        self.helper_nodes = 0  # Nodes searched by the helpers in the last search
+        self.closed = False
+        self.processes = [
+            multiprocessing.Process(target=_smp_helper,
+                                    args=(self.table.name, self.table.host_wide, tasks, self.results, self.stopped),
+                                    daemon=True)
+            for tasks in self.tasks
+        ]
+        for process in self.processes:
+            process.start()
+
+    def start_search(self, board: List[List[int]], player: int, start_time: float, time_limit: float,
+                     max_depth: int) -> None:
+        self.search_id += 1
+        for worker, tasks in enumerate(self.tasks):
+            tasks.put((self.search_id, board, player, worker, start_time, time_limit, max_depth))
+
+    def finish_search(self, timeout: float = 1.0) -> List[Tuple[int, int, int]]:
+        """Stop the helpers, wait until each has acknowledged this search and return their
+        completed (depth, move, score) results; a helper that does not answer within timeout
+        still stops on its own, and its late messages are ignored by the next search"""
+        self.stopped.value = self.search_id
+        completed = []
+        done = 0
+        self.helper_nodes = 0
+        deadline = time.time() + timeout
+        while done < len(self.processes):
+            try:
+                search_id, kind, value = self.results.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            if search_id != self.search_id:
+                continue
+            if kind == "done":
+                done += 1
+                self.helper_nodes += value
+            else:
+                completed.append(value)
+        return completed
+
+    def close(self) -> None:
+        """Stop the helper processes; safe to call more than once"""
+        if self.closed:
+            return
+        self.closed = True
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+        if self.owns_table:
+            self.table.close()
+
+def set_board_size(rows: int, cols: int, win_length: int = 4) -> None:
+    """Switch the engine to another board size (for scaling tests); call before searching, not with SMP helpers running"""
+    global ROWS, COLS, WIN_LENGTH
+    ROWS, COLS, WIN_LENGTH = rows, cols, win_length
+    Connect4AI._cached_winning_lines = None
+    Connect4AI._batch_tables = None
+    IncrementalEvaluator._cell_lines = None
+    IncrementalEvaluator._line_values.clear()
+    Connect4AI._ntuple = None  # Trained for the standard board only
+    Connect4AI._threat_cache.clear()
+    _reset_table()
+
+def set_weights(three_in_row: int, two_in_row: int, block_three: int, block_two: int) -> None:
+    """Switch the evaluation weights (for tuning); call between searches, not with SMP helpers running"""
+    global THREE_IN_ROW, TWO_IN_ROW, BLOCK_THREE, BLOCK_TWO
+    THREE_IN_ROW, TWO_IN_ROW, BLOCK_THREE, BLOCK_TWO = three_in_row, two_in_row, block_three, block_two
+    Connect4AI._batch_tables = None
+    IncrementalEvaluator._cell_lines = None
+    IncrementalEvaluator._line_values.clear()
+    _reset_table()
+
+def host_table_name(prefix: str = HOST_TT_NAME) -> str:
+    """Segment name of the host-wide table for the current board size and evaluation.
+    Processes with other weights, another network or another board size score positions
+    differently, so each configuration gets its own segment"""
+    network = hashlib.sha1(Connect4AI._ntuple.weights.tobytes()).hexdigest() if Connect4AI._ntuple else None
+    config = (ROWS, COLS, WIN_LENGTH, THREE_IN_ROW, TWO_IN_ROW, BLOCK_THREE, BLOCK_TWO,
+              network, NTUPLE_SCALE, USE_THREAT_ANALYSIS, THREAT_WEIGHT)
+    return f"{prefix}_{ROWS}x{COLS}_{hashlib.sha1(repr(config).encode()).hexdigest()[:12]}"
+
+def use_host_table(size_mb: int = HOST_TT_MB, name: str = HOST_TT_NAME) -> SharedTranspositionTable:
+    """Search with the host-wide shared transposition table instead of a per-process one
+    (the segment of this configuration, see host_table_name)"""
+    table = SharedTranspositionTable(size_mb, name=host_table_name(name), host_wide=True)
+    atexit.register(table.close)
+    Connect4AI._host_table = table
+    Connect4AI._host_table_config = (size_mb, name)
+    Connect4AI._transposition_table = table
+    return table
+
+def _reset_table() -> None:
+    """Forget scores and moves of the previous evaluation: clear the move cache and this process's table,
+    or move to the host-wide table of the new configuration (never cleared here, other processes may be
+    searching with it)"""
+    move_cache.clear()
+    if Connect4AI._host_table is not None:
+        Connect4AI._host_table.close()
+        use_host_table(*Connect4AI._host_table_config)
+    else:
+        Connect4AI._transposition_table.clear()
+
+def use_ntuple(path: str = NTUPLE_PATH) -> NTupleNetwork:
+    """Score search leaves with an n-tuple network instead of the window evaluation"""
+    Connect4AI._ntuple = NTupleNetwork.load(path)
+    _reset_table()
+    return Connect4AI._ntuple
+
+move_cache = MoveCache(MOVE_CACHE_SIZE, MOVE_CACHE_TTL)  # Cleared whenever the evaluation changes
+search_lock = threading.Lock()  # Connect4AI keeps global search state, one search at a time
+
+if NTUPLE_PATH:
+    use_ntuple()
+if HOST_TT_MB > 0:
+    use_host_table()
+
+def cached_best_move(board: List[List[int]], player: int, valid_moves: List[int]) -> Tuple[int, int, int]:
+    """find_best_move through the move cache; identical concurrent requests share one search"""
+    key = (Position.from_board(board, player, WIN_LENGTH).key(), TIME_LIMIT, MAX_DEPTH, SMP_WORKERS)
+
+    def search():
+        with search_lock:
+            move, score, depth, _ = Connect4AI.find_best_move(board, player, valid_moves)
+        return move, score, depth
+
+    return move_cache.get_or_compute(key, search)
 
 @app.post("/api/connect4-move")
-async def make_move(game_state: GameState) -> AIResponse:
+def make_move(game_state: GameState) -> AIResponse:
     try:
         start_time = time.time()
         valid_moves = game_state.valid_moves
@@ -424,9 +1075,8 @@ async def make_move(game_state: GameState) -> AIResponse:
         player = game_state.current_player
         
         # Find best move
-        best_move, score, depth, calc_time = Connect4AI.find_best_move(
-            game_state.board, player, valid_moves
-        )
+        best_move, score, depth = cached_best_move(game_state.board, player, valid_moves)
+        calc_time = time.time() - start_time
         
         # Failsafe: Check if returned move is valid
         if best_move not in valid_moves:
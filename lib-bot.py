@@ -1,13 +1,45 @@
 from fastapi import FastAPI, HTTPException
 import uvicorn
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
 import pyspiel
-import copy
+import asyncio
+import contextlib
 import numpy as np
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-app = FastAPI()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+import params
+from connect4 import Position
+from move_cache import MoveCache
+
+# Time budget per move; the simulation count is picked to fit it
+TARGET_MOVE_TIME = 2.5  # seconds
+MIN_SIMULATIONS = 200
+MAX_SIMULATIONS = 50000
+CALIBRATION_WINDOW = 20  # number of recent moves used to estimate simulations per second
+# MCTS constants, overridden by the "pyspiel" section of the tuned parameter file (see Connect4-MCTS/params.py, tune.py)
+_tuned = params.load("pyspiel")
+UCT_C = _tuned.get("UCT_C", 0.5)  # Exploration constant (higher values = more exploration)
+N_ROLLOUTS = _tuned.get("N_ROLLOUTS", 20)  # Random rollouts per evaluated leaf
+SEARCH_WORKERS = int(os.environ.get("PYSPIEL_WORKERS", os.cpu_count() or 1))  # Games searched in parallel
+SESSION_LIMIT = 1024  # Games remembered at most, least recently played dropped first
+SESSION_IDLE = 1800  # Seconds after its last move a game is forgotten
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    # search processes would otherwise outlive the server, holding its listening socket
+    connect4_agent.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,157 +53,182 @@ class GameState(BaseModel):
     board: List[List[int]]
     current_player: int
     valid_moves: List[int]
+    game_id: Optional[str] = None  # Optional; without it games are matched by their position
 
 class AIResponse(BaseModel):
     move: int
 
-class Connect4Agent:
-    def __init__(self):
-        self.game = pyspiel.load_game("connect_four")
-        self.state = self.game.new_initial_state()
-        self.old_board = [[0 for _ in range(7)] for _ in range(6)]
-        self.computer_moves_made = 0
-        
+class TimedMCTSBot:
+    """MCTSBot whose max_simulations is chosen per move to fit TARGET_MOVE_TIME.
+
+    Simulations per second are measured on every move and kept per game phase
+    (number of pieces on the board), since rollouts get shorter as the board fills.
+    """
+    def __init__(self, game, target_time=TARGET_MOVE_TIME, uct_c=None, n_rollouts=None):
+        self.game = game
+        self.target_time = target_time
+        self.uct_c = UCT_C if uct_c is None else uct_c
+        self.evaluator = pyspiel.RandomRolloutEvaluator(n_rollouts=N_ROLLOUTS if n_rollouts is None else n_rollouts,
+                                                        seed=42)
+        self.rates = {}  # phase -> recent simulations/second
+        self.metrics = deque(maxlen=1000)  # one entry per move: budget, elapsed, rate
+
+        # Measure this host before the first real move
+        self.step(game.new_initial_state(), budget=MIN_SIMULATIONS)
+
+    def make_bot(self, max_simulations):
         # Configure MCTS bot with optimal parameters for Connect4
-        self.bot = pyspiel.MCTSBot(
+        return pyspiel.MCTSBot(
             game=self.game,
-            evaluator=pyspiel.RandomRolloutEvaluator(n_rollouts=20, seed=42),
-            uct_c=0.5,  # Exploration constant (higher values = more exploration)
-            max_simulations=10000,  # Increase for stronger play, decrease for speed
+            evaluator=self.evaluator,
+            uct_c=self.uct_c,
+            max_simulations=max_simulations,
             max_memory_mb=400,
             solve=True,  # Try to solve game states when possible
             seed=42,
             verbose=False
         )
 
-    def detect_game_state(self, board):
-        """Detect if this is a new game or continuation."""
-        # Check if board is completely empty (new game)
-        is_empty_board = all(cell == 0 for row in board for cell in row)
-        
-        # Check if board has only one piece (opponent went first in a new game)
-        piece_count = sum(1 for row in board for cell in row if cell != 0)
-        is_first_move = piece_count == 1
-        
-        return is_empty_board, is_first_move
-
-    def find_opponent_move(self, current_board):
-        """Find what move the opponent made since our last move."""
-        for col in range(7):
-            # Count pieces in this column before and after
-            old_count = sum(1 for row in range(6) if self.old_board[row][col] != 0)
-            new_count = sum(1 for row in range(6) if current_board[row][col] != 0)
-            
-            if new_count > old_count:
-                # Find the exact row where piece was added
-                for row in range(5, -1, -1):
-                    if current_board[row][col] != 0 and self.old_board[row][col] == 0:
-                        return col, row
-        
+    @staticmethod
+    def phase(state):
+        return state.move_number() // 6
+
+    def simulations_per_second(self, phase):
+        samples = self.rates.get(phase)
+        if not samples:
+            samples = [rate for rates in self.rates.values() for rate in rates]
+        if not samples:
+            return None
+        # Median keeps one slow (or solved-early) move from swinging the budget
+        return sorted(samples)[len(samples) // 2]
+
+    def choose_budget(self, state):
+        rate = self.simulations_per_second(self.phase(state))
+        if rate is None:
+            return MIN_SIMULATIONS
+        return int(max(MIN_SIMULATIONS, min(MAX_SIMULATIONS, rate * self.target_time)))
+
+    def step(self, state, budget=None):
+        if budget is None:
+            budget = self.choose_budget(state)
+        phase = self.phase(state)
+        start = time.time()
+        action = self.make_bot(budget).step(state)
+        elapsed = time.time() - start
+
+        rate = budget / max(elapsed, 1e-3)
+        self.rates.setdefault(phase, deque(maxlen=CALIBRATION_WINDOW)).append(rate)
+        self.metrics.append({"phase": phase, "budget": budget, "elapsed": elapsed, "rate": rate})
+        print(f"MCTS: {budget} simulations in {elapsed:.2f}s ({rate:.0f}/s)")
+        return action
+
+# Search processes: each keeps its own TimedMCTSBot, so searches of different games run in parallel
+_worker_bot = None
+
+def _init_search_worker():
+    global _worker_bot
+    # forked from the server: drop uvicorn's handlers, which only flag a server this process does not run
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    _worker_bot = TimedMCTSBot(pyspiel.load_game("connect_four"))
+
+def _search(moves):
+    """Bot move after the given move history, with the bot's metrics entry for it"""
+    state = _worker_bot.game.new_initial_state()
+    for col in moves:
+        state.apply_action(col)
+    action = _worker_bot.step(state)
+    return action, _worker_bot.metrics[-1]
+
+class Connect4Agent:
+    """Serves many games at once. Each game is a session (move history and the position after the
+    bot's last move) keyed by game_id, or without one by the stones after the bot's last move.
+    A request that continues a session by one opponent move extends its history; anything else
+    (missed request, restarted server, evicted session) rebuilds the history from the board."""
+    def __init__(self, workers=SEARCH_WORKERS):
+        self.sessions = MoveCache(SESSION_LIMIT, SESSION_IDLE)
+        self.workers = workers
+        self.pool = None  # started on the first search
+        self.metrics = deque(maxlen=1000)  # one entry per search, from every worker
+        # session lookups, counted here rather than by MoveCache (whose stats are for search results):
+        # hits continue their session by one move; misses find no session (new game, idle or evicted);
+        # mismatches find one the board does not continue. Misses and mismatches rebuild the history
+        self.session_hits = 0
+        self.session_misses = 0
+        self.session_mismatches = 0
+
+    @staticmethod
+    def board_key(pos):
+        # position after the bot's move: all stones, and the stones of the player who just moved (the bot)
+        return ("board", pos.mask, pos.position ^ pos.mask)
+
+    def find_session(self, gs: GameState, pos):
+        """Session continued by this request, as (key, moves before the opponent's reply), or (None, None)"""
+        if gs.game_id is not None:
+            key = ("game", gs.game_id)
+            return key, self.sessions.get(key)
+        # the opponent's last stone is on top of one of the columns
+        own = pos.position
+        for col_mask in pos.geometry.column_masks:
+            column = pos.mask & col_mask
+            if not column:
+                continue
+            top = 1 << (column.bit_length() - 1)
+            if own & top:
+                continue
+            key = ("board", pos.mask ^ top, own)
+            session = self.sessions.get(key)
+            if session is not None:
+                return key, session
         return None, None
 
-    def handle_first_move(self, board):
-        """Handle the case where opponent made the first move."""
-        for col in range(7):
-            for row in range(5, -1, -1):
-                if board[row][col] != 0:
-                    # Update our internal state
-                    self.state.apply_action(col)
-                    # Update our board tracking
-                    self.old_board[row][col] = board[row][col]
-                    return col
-        
-        return None
-
-    def get_ai_move(self, gs: GameState) -> int:
-        """Get the best move using MCTS with incremental state tracking."""
-        is_empty_board, is_first_move = self.detect_game_state(gs.board)
-        
-        # CASE 1: Brand new game with empty board
-        if is_empty_board:
-            # Reset everything
-            self.state = self.game.new_initial_state()
-            self.old_board = [[0 for _ in range(7)] for _ in range(6)]
-            self.computer_moves_made = 0
-            
+    def history(self, gs: GameState, pos):
+        """Move history leading to the request's board, from its session when possible"""
+        _, session = self.find_session(gs, pos)
+        if session is None:
+            self.session_misses += 1
+        else:
+            moves, last = session
+            for col in last.legal_moves():
+                after = last.move(col)
+                if after.mask == pos.mask and after.position == pos.position:
+                    self.session_hits += 1
+                    return moves + [col]
+            self.session_mismatches += 1
+        moves = Position.moves_from_board(gs.board, gs.current_player)
+        if moves is None:
+            raise ValueError("Board cannot be reached by legal play")
+        return moves
+
+    def save(self, gs: GameState, moves, pos):
+        key = ("game", gs.game_id) if gs.game_id is not None else Connect4Agent.board_key(pos)
+        self.sessions.put(key, (moves, pos))
+
+    async def get_ai_move(self, gs: GameState) -> int:
+        pos = Position.from_board(gs.board, gs.current_player)
+        if pos.terminal:
+            raise ValueError("Game is already completed")
+        moves = self.history(gs, pos)
+
+        if not moves:
             # Center column is a strong opening move
-            best_move = 3
-            
-            # Apply our move to our internal state
-            self.state.apply_action(best_move)
-            
-            # Update our board tracking
-            for row in range(5, -1, -1):
-                if self.old_board[row][best_move] == 0:
-                    self.old_board[row][best_move] = 2  # AI uses player 2
-                    break
-            
-            self.computer_moves_made += 1
-            return best_move
-            
-        # CASE 2: New game where opponent went first
-        elif is_first_move:
-            # Reset everything
-            self.state = self.game.new_initial_state()
-            self.old_board = [[0 for _ in range(7)] for _ in range(6)]
-            self.computer_moves_made = 0
-            
-            # Apply opponent's first move to our state
-            opponent_col = self.handle_first_move(gs.board)
-            
-            # Use MCTS for our response
-            action = self.bot.step(self.state)
-            
-            # Apply our move to internal state
-            self.state.apply_action(action)
-            
-            # Update our board tracking
-            for row in range(5, -1, -1):
-                if self.old_board[row][action] == 0:
-                    self.old_board[row][action] = 2  # AI uses player 2
-                    break
-            
-            self.computer_moves_made += 1
-            return action
-            
-        # CASE 3: Continuing game - find opponent's last move and respond
+            action = 3
         else:
-            # Find opponent's move since last time
-            opp_col, opp_row = self.find_opponent_move(gs.board)
-            print(f"Opponent moved: {opp_col}, {opp_row}")
-            if opp_col is not None:
-                # Update our tracking board
-                self.old_board[opp_row][opp_col] = gs.board[opp_row][opp_col]
-                
-                # Apply opponent's move to our state
-                if not self.state.is_terminal():
-                    self.state.apply_action(opp_col)
-            
-            # Use MCTS to choose our move
-            if not self.state.is_terminal():
-                action = self.bot.step(self.state)
-                
-                # Apply our move to internal state
-                self.state.apply_action(action)
-                
-                # Verify move is valid
-                if action not in gs.valid_moves:
-                    # Fallback if MCTS gives invalid move
-                    action = gs.valid_moves[0]
-                
-                # Update our board tracking
-                for row in range(5, -1, -1):
-                    if self.old_board[row][action] == 0:
-                        self.old_board[row][action] = 2  # AI uses player 2
-                        break
-                
-                self.computer_moves_made += 1
-                return action
-            else:
-                # Game is terminal, return a valid move if available
-                if gs.valid_moves:
-                    return gs.valid_moves[0]
-                raise ValueError("Game is already completed")
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers, initializer=_init_search_worker)
+            action, metrics = await asyncio.get_running_loop().run_in_executor(self.pool, _search, moves)
+            self.metrics.append(metrics)
+        if action not in gs.valid_moves:
+            # Fallback if MCTS gives invalid move
+            action = gs.valid_moves[0]
+
+        self.save(gs, moves + [action], pos.move(action))
+        return action
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
 
 # Initialize the agent
 connect4_agent = Connect4Agent()
@@ -184,8 +241,7 @@ async def make_move(game_state: GameState) -> AIResponse:
             raise ValueError("No valid moves available")
             
         # Get the AI's move
-        next_move = connect4_agent.get_ai_move(game_state)
-        print(next_move)
+        next_move = await connect4_agent.get_ai_move(game_state)
         return AIResponse(move=next_move)
     except Exception as e:
         # Fallback to the first valid move if something goes wrong
@@ -198,6 +254,21 @@ async def make_move(game_state: GameState) -> AIResponse:
 async def health():
     return {"status": "ok"}
 
+@app.get("/api/metrics")
+async def metrics():
+    moves = list(connect4_agent.metrics)
+    rates = {}
+    for entry in moves:
+        rates.setdefault(entry["phase"], []).append(entry["rate"])
+    return {
+        "target_time": TARGET_MOVE_TIME,
+        "workers": connect4_agent.workers,
+        "simulations_per_second": {phase: sorted(r)[len(r) // 2] for phase, r in sorted(rates.items())},
+        "sessions": {"stored": len(connect4_agent.sessions), "hits": connect4_agent.session_hits,
+                     "misses": connect4_agent.session_misses, "mismatches": connect4_agent.session_mismatches},
+        "moves": moves[-100:],
+    }
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+from connect4 import Connect4, Position
+import wire
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+class Stats:
+    """Per-move measurements collected from all simulated games"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.timeouts = 0
+        self.errors = 0
+        self.invalid = 0
+        self.first_valid = 0  # Replies equal to valid_moves[0], the servers' error fallback
+        self.first_valid_chance = 0.0  # Expected number of such replies if moves were unrelated to the order
+        self.fallback_source = 0  # Replies whose source says fallback or error (server.py)
+        self.results = {"win": 0, "loss": 0, "draw": 0, "aborted": 0}
+
+    def add_move(self, latency, valid_moves, response):
+        with self.lock:
+            self.latencies.append(latency)
+            move = response.get("move")
+            if move not in valid_moves:
+                self.invalid += 1
+            if move == valid_moves[0]:
+                self.first_valid += 1
+            self.first_valid_chance += 1 / len(valid_moves)
+            if response.get("source") in ("fallback", "error"):
+                self.fallback_source += 1
+
+    def count(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def finish(self, result):
+        with self.lock:
+            self.results[result] += 1
+
+def opponent_move(pos):
+    """Simulated human: takes a win, blocks a threat, otherwise a random move leaning to the center"""
+    moves = pos.legal_moves()
+    for col in moves:
+        if pos.move(col).connected_four_fast():
+            return col
+    # the same position with the other side to move shows the bot's immediate wins
+    passed = Position(int(not pos.turn), pos.mask, pos.position ^ pos.mask, pos.num_turns, pos.geometry)
+    for col in moves:
+        if passed.move(col).connected_four_fast():
+            return col
+    center = pos.geometry.width // 2
+    weights = [pos.geometry.width - abs(col - center) for col in moves]
+    return random.choices(moves, weights)[0]
+
+def to_board(pos, mover):
+    """Rows top first, mover is the piece value (1 or 2) of the side to move"""
+    geometry = pos.geometry
+    board = [[0] * geometry.width for _ in range(geometry.height)]
+    for col in range(geometry.width):
+        for row in range(geometry.height):
+            bit = 1 << (col * geometry.stride + row)
+            if pos.mask & bit:
+                board[geometry.height - 1 - row][col] = mover if pos.position & bit else 3 - mover
+    return board
+
+def post(url, payload, timeout):
+    # payload: a GameState dict, or bytes of a compact request (Connect4-MCTS/wire.py)
+    if isinstance(payload, bytes):
+        request = urllib.request.Request(url, data=payload, headers={"Content-Type": wire.CONTENT_TYPE})
+    else:
+        request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def play_game(game_id, args, stats):
+    """One game over HTTP; the bot moves first in even games. A timeout or error ends the game"""
+    url = args.url.rstrip("/") + "/api/connect4-move"
+    bot_first = game_id % 2 == 0
+    bot_piece = 1 if bot_first else 2
+    pos = Connect4().get_initial_position()
+    bot_turn = 0 if bot_first else 1
+    history = []
+    while not pos.terminal:
+        if pos.turn == bot_turn:
+            valid_moves = pos.legal_moves()
+            # random order so a reply of valid_moves[0] (the error fallback) stands out from real choices
+            random.shuffle(valid_moves)
+            if args.compact:
+                payload = ("".join(map(str, history)) + (f";{args.engine}" if args.engine else "")).encode()
+            else:
+                payload = {"board": to_board(pos, bot_piece), "current_player": bot_piece, "valid_moves": valid_moves}
+                if args.engine:
+                    payload["engine"] = args.engine
+            start = time.time()
+            try:
+                response = post(url, payload, args.timeout)
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                timed_out = isinstance(e, TimeoutError) or isinstance(getattr(e, "reason", None), TimeoutError)
+                stats.count("timeouts" if timed_out else "errors")
+                stats.finish("aborted")
+                return
+            stats.add_move(time.time() - start, valid_moves, response)
+            move = response.get("move")
+            if move not in valid_moves:
+                stats.finish("aborted")
+                return
+        else:
+            time.sleep(random.expovariate(1 / args.think) if args.think > 0 else 0)
+            move = opponent_move(pos)
+        history.append(move)
+        pos = pos.move(move)
+    if pos.result == 0:
+        stats.finish("draw")
+    else:
+        # result is from the first player's point of view
+        first_won = pos.result == 1
+        stats.finish("win" if first_won == bot_first else "loss")
+
+def wait_for_port(url, timeout):
+    parsed = urlparse(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((parsed.hostname, parsed.port or 80), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def run(args):
+    stats = Stats()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for game_id in range(args.games):
+            pool.submit(play_game, game_id, args, stats)
+            # games arrive as a Poisson process
+            if args.rate > 0:
+                time.sleep(random.expovariate(args.rate))
+    return stats, time.time() - start
+
+def summarize(stats, elapsed):
+    moves = len(stats.latencies)
+    summary = {
+        "games": sum(stats.results.values()), "results": stats.results,
+        "moves": moves, "elapsed": elapsed, "moves_per_second": moves / elapsed if elapsed > 0 else None,
+        "timeouts": stats.timeouts, "errors": stats.errors, "invalid_moves": stats.invalid,
+        "fallback_source": stats.fallback_source,
+        "first_valid_rate": stats.first_valid / moves if moves else None,
+        "first_valid_rate_by_chance": stats.first_valid_chance / moves if moves else None,
+        "latency": {f"p{p}": percentile(stats.latencies, p) for p in (50, 90, 95, 99)},
+    }
+    summary["latency"]["max"] = max(stats.latencies) if stats.latencies else None
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many concurrent Connect 4 games against a bot server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="server base URL")
+    parser.add_argument("--server", help="command that starts the server (e.g. 'python backup.py'), "
+                                         "stopped when the test ends")
+    parser.add_argument("--games", type=int, default=20, help="number of games to play")
+    parser.add_argument("--concurrency", type=int, default=8, help="games played at the same time at most")
+    parser.add_argument("--rate", type=float, default=2.0, help="new games per second (0 = all at once)")
+    parser.add_argument("--think", type=float, default=1.0, help="mean think time of the simulated opponent")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds before a move request times out")
+    parser.add_argument("--engine", help="engine field sent to server.py")
+    parser.add_argument("--compact", action="store_true",
+                        help="send move histories in the compact format of server.py instead of JSON boards")
+    parser.add_argument("--seed", type=int, help="random seed for the opponent and arrivals")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = None
+    if args.server:
+        server = subprocess.Popen(shlex.split(args.server), cwd=os.path.dirname(os.path.abspath(__file__)))
+        if not wait_for_port(args.url, 60):
+            server.terminate()
+            sys.exit("Server did not start listening")
+    try:
+        stats, elapsed = run(args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(stats, elapsed)
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+from gamelog import read_records
+import server
+from server import MoveRequest, SearchResult, ENGINES
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def default_time_limit():
+    # engine time of a server request, for records without a recorded time limit
+    return server.RESPONSE_SLA - server.ENGINE_MARGIN
+
+def replay(path, engine=None, limit=None, time_limit=None):
+    """Search every recorded position again with the engine alone (no book, tactical or proof
+    shortcuts) and its recorded time limit, and compare moves and think times"""
+    results = []
+    skipped = 0
+    for i, record in enumerate(read_records(path)):
+        if limit is not None and i >= limit:
+            break
+        engine_name = engine or record.engine
+        if engine_name not in ENGINES:
+            skipped += 1
+            continue
+        try:
+            request = MoveRequest.from_compact("".join(map(str, record.moves)).encode())
+        except ValueError as e:
+            print(f"Skipping record {i}: {e}")
+            skipped += 1
+            continue
+        seconds = time_limit or record.params.get("time_limit") or default_time_limit()
+        result = SearchResult()
+        start = time.time()
+        ENGINES[engine_name](request, seconds, result.report)
+        elapsed = time.time() - start
+        results.append({
+            "moves": "".join(str(col) for col in record.moves),
+            "engine": engine_name,
+            "time_limit": seconds,
+            "recorded_move": record.move,
+            "replayed_move": result.move,
+            "recorded_time": record.think_time,
+            "replayed_time": elapsed,
+            "recorded_source": record.params.get("source"),
+            "recorded_nodes": record.nodes,
+            "replayed_nodes": result.nodes,
+        })
+        print(f"{results[-1]['moves'] or '-':>20} {engine_name:>8} move {record.move} -> {result.move} "
+              f"time {record.think_time:.3f}s -> {elapsed:.3f}s (limit {seconds:.3f}s)")
+    return results, skipped
+
+def summarize(results, skipped):
+    recorded = [r["recorded_time"] for r in results]
+    replayed = [r["replayed_time"] for r in results]
+    same = sum(r["recorded_move"] == r["replayed_move"] for r in results)
+    summary = {"records": len(results), "skipped": skipped,
+               "same_move": same / len(results) if results else None}
+    for name, times in (("recorded", recorded), ("replayed", replayed)):
+        summary[name] = {"p50": percentile(times, 50), "p95": percentile(times, 95),
+                         "max": max(times) if times else None}
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a Connect 4 game log through an engine")
+    parser.add_argument("log", help="game log written with CONNECT4_GAME_LOG")
+    parser.add_argument("--engine", help="engine to replay with (default: the recorded engine)")
+    parser.add_argument("--limit", type=int, help="replay at most this many records")
+    parser.add_argument("--time-limit", type=float,
+                        help="engine seconds per move (default: the recorded time limit, else the server's)")
+    parser.add_argument("--json", help="write per-record results and the summary to this file")
+    args = parser.parse_args()
+
+    results, skipped = replay(args.log, args.engine, args.limit, args.time_limit)
+    summary = summarize(results, skipped)
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "records": results}, f, indent=2)
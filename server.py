@@ -0,0 +1,353 @@
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+import uvicorn
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import Callable, Dict, List, Optional
+from fastapi.middleware.cors import CORSMiddleware
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+# The pure MCTS engine lives in Connect4-MCTS/ and imports its modules by plain name
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "Connect4-MCTS"))
+
+from connect4 import Connect4, Position
+from gamelog import GameLog
+import mcts
+from mcts import get_nodes, best_move
+from pns import ProofNumberSearch
+import wire
+from backup import Connect4AI
+
+app = FastAPI()
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+RESPONSE_SLA = float(os.environ.get("CONNECT4_SLA", "3.0"))  # Seconds from request to response
+ENGINE_MARGIN = 0.3  # Seconds kept back from the engine for the cascade itself
+DEFAULT_ENGINE = os.environ.get("CONNECT4_ENGINE", "minimax")
+PROOF_TIME = float(os.environ.get("CONNECT4_PROOF_TIME", "0.25"))  # Seconds of forced-win search per move (0 = off)
+PROOF_MEMORY_MB = 64  # Transposition table of the proof-number search, kept across requests
+# opt-in binary record of every served move (see Connect4-MCTS/gamelog.py and replay.py)
+game_log = GameLog(os.environ["CONNECT4_GAME_LOG"]) if os.environ.get("CONNECT4_GAME_LOG") else None
+CENTER = 3
+ROWS, COLS = 6, 7
+
+class GameState(BaseModel):
+    board: List[List[int]]
+    current_player: int
+    valid_moves: List[int]
+    engine: Optional[str] = None
+
+    @field_validator("board")
+    @classmethod
+    def check_board(cls, board: List[List[int]]) -> List[List[int]]:
+        if len(board) != ROWS or any(len(row) != COLS for row in board):
+            raise ValueError(f"board must be {ROWS} rows of {COLS} cells")
+        if any(cell not in (0, 1, 2) for row in board for cell in row):
+            raise ValueError("board cells must be 0, 1 or 2")
+        return board
+
+    @field_validator("current_player")
+    @classmethod
+    def check_player(cls, player: int) -> int:
+        if player not in (1, 2):
+            raise ValueError("current_player must be 1 or 2")
+        return player
+
+    @field_validator("valid_moves")
+    @classmethod
+    def check_moves(cls, valid_moves: List[int]) -> List[int]:
+        if any(not 0 <= col < COLS for col in valid_moves):
+            raise ValueError(f"valid_moves must be columns 0-{COLS - 1}")
+        return valid_moves
+
+class AIResponse(BaseModel):
+    move: int
+    evaluation: Optional[float] = None
+    depth: Optional[int] = None
+    execution_time: Optional[float] = None
+    source: Optional[str] = None  # Cascade stage that produced the move
+
+class MoveRequest:
+    """Position to move in, from a JSON GameState or a compact wire request (see Connect4-MCTS/wire.py);
+    the board and the move history are only built when an engine or the game log needs them"""
+    def __init__(self, pos: Position, player: int, valid_moves: List[int], engine: Optional[str] = None,
+                 board: Optional[List[List[int]]] = None, moves: Optional[List[int]] = None):
+        if engine is not None and engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, expected one of {', '.join(sorted(ENGINES))}")
+        self.pos = pos
+        self.player = player
+        self.valid_moves = valid_moves
+        self.engine = engine
+        self._board = board
+        self._moves = moves
+        # search stats of the served move, for the game log (None when no engine search ran)
+        self.time_limit: Optional[float] = None
+        self.nodes: Optional[int] = None
+
+    @staticmethod
+    def from_game_state(gs: GameState) -> "MoveRequest":
+        return MoveRequest(Position.from_board(gs.board, gs.current_player), gs.current_player,
+                           gs.valid_moves, gs.engine, board=gs.board)
+
+    @staticmethod
+    def from_compact(body: bytes) -> "MoveRequest":
+        pos, moves, engine = wire.decode_request(body)
+        return MoveRequest(pos, pos.turn + 1, pos.legal_moves(), engine, moves=moves)
+
+    @property
+    def board(self) -> List[List[int]]:
+        if self._board is None:
+            # rows top first; stones of the side to move carry its piece value
+            board = [[0] * COLS for _ in range(ROWS)]
+            for col in range(COLS):
+                for row in range(ROWS):
+                    bit = 1 << (col * (ROWS + 1) + row)
+                    if self.pos.mask & bit:
+                        board[ROWS - 1 - row][col] = self.player if self.pos.position & bit else 3 - self.player
+            self._board = board
+        return self._board
+
+    @property
+    def moves(self) -> Optional[List[int]]:
+        """A move order reaching the position, None if no legal order exists"""
+        if self._moves is None:
+            self._moves = Position.moves_from_board(self.board, self.player)
+        return self._moves
+
+class SearchResult:
+    """Best move reported so far by an engine; engines report partial results as they improve"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.move: Optional[int] = None
+        self.score: Optional[float] = None
+        self.depth: Optional[int] = None
+        self.nodes: Optional[int] = None  # Nodes (or simulations) searched for the reported move
+
+    def report(self, move: int, score: Optional[float] = None, depth: Optional[int] = None,
+               nodes: Optional[int] = None) -> None:
+        with self.lock:
+            self.move, self.score, self.depth, self.nodes = move, score, depth, nodes
+
+# name -> engine(request, time_limit, report) with a MoveRequest; engines must return within time_limit
+# and call report(move, score, depth, nodes) with every improved result
+ENGINES: Dict[str, Callable] = {}
+ENGINE_LOCKS: Dict[str, threading.Lock] = {}  # Engines keep global search state, one search at a time
+
+def register_engine(name: str):
+    def decorator(engine: Callable) -> Callable:
+        ENGINES[name] = engine
+        ENGINE_LOCKS[name] = threading.Lock()
+        return engine
+    return decorator
+
+@register_engine("minimax")
+def minimax_engine(request, time_limit, report):
+    move, score, depth, _ = Connect4AI.find_best_move(
+        request.board, request.player, request.valid_moves, time_limit=time_limit,
+        on_depth=lambda d, m, s: report(m, s, d, Connect4AI._node_count)
+    )
+    nodes = Connect4AI._node_count
+    if Connect4AI._smp_pool is not None:
+        nodes += Connect4AI._smp_pool.helper_nodes
+    report(move, score, depth, nodes)
+
+@register_engine("mcts")
+def mcts_engine(request, time_limit, report):
+    pos = request.pos
+    nodes = get_nodes(pos, time_limit)
+    move = best_move(pos, nodes)
+    if move is not None:
+        w, n, _ = nodes.get(pos.move(move), (0.0, 0.0, None))
+        report(move, w / n if n > 0 else None, None, mcts.last_stats.get("leaves"))
+
+def load_pyspiel_engine() -> None:
+    """Register the PySpiel MCTS bot from lib-bot.py when open_spiel is installed"""
+    try:
+        spec = importlib.util.spec_from_file_location("lib_bot", os.path.join(BASE_DIR, "lib-bot.py"))
+        lib_bot = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(lib_bot)
+    except ImportError as e:
+        print(f"PySpiel engine disabled: {e}")
+        return
+
+    bot = lib_bot.TimedMCTSBot(lib_bot.pyspiel.load_game("connect_four"))
+
+    @register_engine("pyspiel")
+    def pyspiel_engine(request, time_limit, report):
+        moves = request.moves
+        if moves is None:
+            raise ValueError("Board cannot be reached by legal play")
+        state = bot.game.new_initial_state()
+        for col in moves:
+            state.apply_action(col)
+        bot.target_time = time_limit
+        move = bot.step(state)
+        report(move, nodes=bot.metrics[-1]["budget"])
+
+load_pyspiel_engine()
+
+# Opening book: move sequence -> reply
+OPENING_LINES = {"": CENTER, **{str(col): CENTER for col in range(7)}}
+
+def build_opening_book() -> Dict[int, int]:
+    book = {}
+    for line, reply in OPENING_LINES.items():
+        pos = Connect4().get_initial_position()
+        for col in line:
+            pos = pos.move(int(col))
+        book[pos.key()] = reply
+    return book
+
+OPENING_BOOK = build_opening_book()
+
+proof_search = ProofNumberSearch(PROOF_MEMORY_MB)
+proof_lock = threading.Lock()
+
+def prove_win(pos: Position, time_limit: float) -> Optional[int]:
+    """Winning move if a forced win is proven within time_limit; skipped while another request is proving"""
+    if time_limit <= 0 or not proof_lock.acquire(blocking=False):
+        return None
+    try:
+        result = proof_search.solve(pos, time_limit)
+    finally:
+        proof_lock.release()
+    return result.move if result.status == "win" else None
+
+def in_mask(pos: Position, cells: int, valid_moves: List[int]) -> List[int]:
+    """Valid moves whose column has a cell in the mask, in valid_moves order"""
+    columns = set(pos.columns(cells))
+    return [col for col in valid_moves if col in columns]
+
+def safe_moves(pos: Position, valid_moves: List[int]) -> List[int]:
+    """Columns after which the opponent has no immediate win, center first"""
+    return sorted(in_mask(pos, pos.non_losing_mask(), valid_moves), key=lambda c: abs(c - CENTER))
+
+def choose_move(request: MoveRequest) -> AIResponse:
+    """Cascade: opening book, tactical check, forced-win proof, main engine, then the best partial result"""
+    start_time = time.time()
+    deadline = start_time + RESPONSE_SLA
+    valid_moves = request.valid_moves
+    pos = request.pos
+
+    def respond(move, source, score=None, depth=None):
+        return AIResponse(move=move, evaluation=score, depth=depth,
+                          execution_time=time.time() - start_time, source=source)
+
+    # 1) Opening book
+    book_move = OPENING_BOOK.get(pos.key())
+    if book_move in valid_moves:
+        return respond(book_move, "book")
+
+    # 2) Tactical check: win now, or block the opponent's win
+    wins = in_mask(pos, pos.own_winning_mask(), valid_moves)
+    if wins:
+        return respond(wins[0], "tactical")
+    blocks = in_mask(pos, pos.opponent_winning_mask() & pos.possible_mask(), valid_moves)
+    if blocks:
+        return respond(blocks[0], "tactical")
+
+    # 3) Proven forced win, from a short proof-number search
+    proof_move = prove_win(pos, min(PROOF_TIME, (deadline - ENGINE_MARGIN - time.time()) / 4))
+    if proof_move in valid_moves:
+        return respond(proof_move, "proof")
+
+    # 4) Main engine, in a thread so the deadline holds even if it overruns
+    safe = safe_moves(pos, valid_moves) or sorted(valid_moves, key=lambda c: abs(c - CENTER))
+    engine_name = request.engine or DEFAULT_ENGINE
+    engine = ENGINES.get(engine_name)
+    if engine is None:
+        raise ValueError(f"Unknown engine {engine_name}")
+    result = SearchResult()
+
+    def run_engine():
+        lock = ENGINE_LOCKS[engine_name]
+        if not lock.acquire(timeout=max(0.0, deadline - ENGINE_MARGIN - time.time())):
+            return
+        try:
+            time_limit = deadline - ENGINE_MARGIN - time.time()
+            request.time_limit = time_limit
+            if time_limit > 0:
+                engine(request, time_limit, result.report)
+        except Exception as e:
+            print(f"Engine {engine_name} failed: {e}")
+        finally:
+            lock.release()
+
+    worker = threading.Thread(target=run_engine, daemon=True)
+    worker.start()
+    worker.join(timeout=max(0.0, deadline - time.time() - 0.05))
+
+    # 5) Best result so far, unless it hands the opponent an immediate win
+    with result.lock:
+        move, score, depth, request.nodes = result.move, result.score, result.depth, result.nodes
+    source = engine_name if not worker.is_alive() else f"{engine_name}-partial"
+    if move in safe:
+        return respond(move, source, score, depth)
+    return respond(safe[0], "fallback")
+
+def log_move(request: MoveRequest, response: AIResponse) -> None:
+    moves = request.moves
+    if moves is None:
+        # no legal move order reaches the board, a record could not be replayed
+        print("Move not logged: board cannot be reached by legal play")
+        return
+    game_log.append(
+        moves, response.move, response.execution_time, request.engine or DEFAULT_ENGINE,
+        params={"source": response.source, "sla": RESPONSE_SLA, "time_limit": request.time_limit},
+        depth=response.depth, score=response.evaluation, nodes=request.nodes,
+    )
+
+def serve_move(request: MoveRequest) -> AIResponse:
+    try:
+        if not request.valid_moves:
+            raise ValueError("No valid moves available")
+        response = choose_move(request)
+        if game_log is not None:
+            log_move(request, response)
+        return response
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        if request.valid_moves:
+            center = CENTER if CENTER in request.valid_moves else request.valid_moves[0]
+            return AIResponse(move=center, source="error")
+        raise HTTPException(status_code=400, detail=str(e))
+
+# The body is a JSON GameState, or a compact request when sent with Content-Type wire.CONTENT_TYPE
+@app.post("/api/connect4-move", response_model=AIResponse,
+          openapi_extra={"requestBody": {"content": {
+              "application/json": {"schema": GameState.model_json_schema()},
+              wire.CONTENT_TYPE: {"schema": {"type": "string", "example": "3342;minimax"}},
+          }}})
+async def make_move(http_request: Request) -> Response:
+    body = await http_request.body()
+    try:
+        if http_request.headers.get("content-type", "").startswith(wire.CONTENT_TYPE):
+            request = MoveRequest.from_compact(body)
+        else:
+            request = MoveRequest.from_game_state(GameState.model_validate_json(body))
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response = await run_in_threadpool(serve_move, request)
+    return Response(content=wire.encode_response(response), media_type="application/json")
+
+@app.get("/api/engines")
+async def engines():
+    return {"default": DEFAULT_ENGINE, "engines": sorted(ENGINES)}
+
+@app.get("/api/test")
+async def health():
+    return {"status": "ok"}
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,284 @@
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+from connect4 import Connect4
+from gamelog import board_from_moves
+
+# Tactical suite: positions with solved best moves, and time-to-solution of every engine on them.
+# Suite file: one JSON object per line with
+#   moves      columns played from the empty board, e.g. "3342"
+#   category   block (stop an immediate threat), win (forced win, "plies" until it),
+#              long-win (forced win of 9+ plies starting with a quiet move, usually odd/even
+#              threat play) or hold (drawn position where most moves lose)
+#   good       moves that keep the solved result, best: the fastest wins among them
+SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tactics_suite.jsonl")
+CELLS = 42
+
+class Solver:
+    """Exact negamax solver; score > 0: the side to move wins, the larger the sooner, 0: draw"""
+    def __init__(self, max_entries=2_000_000):
+        self.table = {}  # key -> upper bound of the score
+        self.max_entries = max_entries
+
+    def negamax(self, pos, alpha, beta):
+        if pos.own_winning_mask():
+            return (CELLS + 1 - pos.num_turns) // 2
+        non_losing = pos.non_losing_mask()
+        if not non_losing:
+            return -((CELLS - pos.num_turns) // 2)
+        if pos.num_turns >= CELLS - 2:
+            return 0
+        # the opponent cannot win on its next move, so the best we can suffer is a later loss
+        alpha = max(alpha, -((CELLS - 2 - pos.num_turns) // 2))
+        if alpha >= beta:
+            return alpha
+        upper = self.table.get(pos.key(), (CELLS - 1 - pos.num_turns) // 2)
+        beta = min(beta, upper)
+        if alpha >= beta:
+            return beta
+
+        # moves creating the most threats first, then central columns
+        children = []
+        for col in pos.columns(non_losing):
+            child = pos.move(col)
+            threats = bin(child.winning_mask(child.position ^ child.mask)).count("1")
+            children.append((-threats, abs(col - 3), child))
+        children.sort(key=lambda c: c[:2])
+        for _, _, child in children:
+            score = -self.negamax(child, -beta, -alpha)
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        self.table[pos.key()] = alpha
+        return alpha
+
+    def solve(self, pos):
+        if pos.terminal:
+            return 0 if pos.result == 0 else -((CELLS + 2 - pos.num_turns) // 2)
+        # null-window searches narrowing [low, high] (as in Pascal Pons' solver)
+        low, high = -((CELLS - pos.num_turns) // 2), (CELLS + 1 - pos.num_turns) // 2
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and low // 2 < med:
+                med = low // 2
+            elif med >= 0 and high // 2 > med:
+                med = high // 2
+            score = self.negamax(pos, med, med + 1)
+            if score <= med:
+                high = score
+            else:
+                low = score
+        return low
+
+def position_from_moves(moves):
+    pos = Connect4().get_initial_position()
+    for col in moves:
+        pos = pos.move(int(col))
+    return pos
+
+def classify(pos, solver):
+    """Suite entry for pos, or None when the position does not discriminate between engines"""
+    moves = pos.legal_moves()
+    if len(moves) < 4 or pos.own_winning_mask():
+        return None
+    scores = {col: -solver.solve(pos.move(col)) for col in moves}
+    best_score = max(scores.values())
+    if best_score < 0:
+        return None  # lost anyway, no right answer
+    if best_score > 0:
+        good = [col for col in moves if scores[col] > 0]
+    else:
+        good = [col for col in moves if scores[col] == 0]
+    if len(good) > 2:
+        return None
+    entry = {"good": good, "best": [col for col in moves if scores[col] == best_score], "score": best_score}
+    if pos.opponent_winning_mask() & pos.possible_mask():
+        entry["category"] = "block"
+    elif best_score > 0:
+        # with best play on both sides the win comes with move number CELLS + 2 - 2 * score,
+        # or the one before it, whichever is ours
+        plies = CELLS + 2 - 2 * best_score - pos.num_turns
+        entry["plies"] = plies if plies % 2 == 1 else plies - 1
+        after = pos.move(entry["best"][0])
+        quiet = not (after.winning_mask(after.position ^ after.mask) & after.possible_mask())
+        entry["category"] = "long-win" if entry["plies"] >= 9 and quiet else "win"
+    else:
+        entry["category"] = "hold"
+    return entry
+
+def generate(count, min_stones, max_stones, seed):
+    """Positions from random games that only avoid immediate losses, solved exactly"""
+    rng = random.Random(seed)
+    solver = Solver()
+    suite, seen = [], set()
+    per_category = {}
+    while len(suite) < count:
+        pos = Connect4().get_initial_position()
+        moves = []
+        target = rng.randint(min_stones, max_stones)
+        while len(moves) < target and not pos.terminal and not pos.own_winning_mask():
+            col = rng.choice(pos.columns(pos.non_losing_mask()) or pos.legal_moves())
+            moves.append(col)
+            pos = pos.move(col)
+        line = "".join(map(str, moves))
+        if pos.terminal or line in seen:
+            continue
+        seen.add(line)
+        entry = classify(pos, solver)
+        # keep the categories balanced
+        if entry is None or per_category.get(entry["category"], 0) >= count // 3:
+            continue
+        per_category[entry["category"]] = per_category.get(entry["category"], 0) + 1
+        suite.append({"moves": line, **entry})
+        print(f"{len(suite):4} {line:>30} {entry['category']:>8} good {entry['good']}")
+    return suite
+
+def load_suite(path=SUITE):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def solution_point(samples, good):
+    """First sample from which the chosen move is good until the end; samples are (time, iterations, move)"""
+    point = None
+    for sample in samples:
+        if sample[2] in good:
+            if point is None:
+                point = sample
+        else:
+            point = None
+    return point
+
+def run_minimax(entry, time_limit):
+    from backup import Connect4AI
+    board, player = board_from_moves([int(c) for c in entry["moves"]])
+    valid_moves = [col for col in range(7) if board[0][col] == 0]
+    samples = []
+    start = time.time()
+    move, _, depth, _ = Connect4AI.find_best_move(
+        board, player, valid_moves, time_limit=time_limit,
+        on_depth=lambda d, m, s: samples.append((time.time() - start, d, m))
+    )
+    samples.append((time.time() - start, depth, move))
+    return samples
+
+def run_mcts(entry, time_limit):
+    # get_nodes is the search behind ucb2_agent; its progress callback samples the move it would play
+    from mcts import get_nodes, best_move
+    pos = position_from_moves(entry["moves"])
+    samples = []
+    start = time.time()
+    nodes = get_nodes(pos, time_limit,
+                      progress=lambda leaves, nodes: samples.append((time.time() - start, leaves,
+                                                                     best_move(pos, nodes, verbose=False))))
+    samples.append((time.time() - start, nodes[pos][1], best_move(pos, nodes, verbose=False)))
+    return samples
+
+def load_pyspiel_bot():
+    spec = importlib.util.spec_from_file_location("lib_bot", os.path.join(os.path.dirname(SUITE), "lib-bot.py"))
+    lib_bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(lib_bot)
+    return lib_bot.TimedMCTSBot(lib_bot.pyspiel.load_game("connect_four"))
+
+def run_pyspiel(entry, time_limit, bot):
+    # simulation budgets double until the time limit is spent; each budget is a fresh search
+    samples = []
+    start = time.time()
+    budget = 64
+    while time.time() - start < time_limit:
+        state = bot.game.new_initial_state()
+        for col in entry["moves"]:
+            state.apply_action(int(col))
+        samples.append((time.time() - start, budget, bot.step(state, budget)))
+        budget *= 2
+    return samples
+
+def run_suite(suite, engines, time_limit):
+    runners = {"minimax": run_minimax, "mcts": run_mcts}
+    if "pyspiel" in engines:
+        try:
+            bot = load_pyspiel_bot()
+            runners["pyspiel"] = lambda entry, limit: run_pyspiel(entry, limit, bot)
+        except ImportError as e:
+            print(f"PySpiel engine skipped: {e}")
+    results = []
+    for i, entry in enumerate(suite):
+        for engine in engines:
+            if engine not in runners:
+                continue
+            samples = runners[engine](entry, time_limit)
+            point = solution_point(samples, entry["good"])
+            results.append({
+                "moves": entry["moves"], "category": entry["category"], "engine": engine,
+                "move": samples[-1][2], "solved": point is not None,
+                "time": point[0] if point else None, "iterations": point[1] if point else None,
+            })
+            print(f"{i + 1:4} {entry['moves']:>30} {entry['category']:>8} {engine:>8} "
+                  f"move {samples[-1][2]} good {entry['good']} "
+                  + (f"solved at {point[0]:.2f}s / {point[1]}" if point else "not solved"))
+    return results
+
+def summarize(results):
+    """engine -> category -> solved share and median time to solution"""
+    summary = {}
+    for engine in sorted({r["engine"] for r in results}):
+        summary[engine] = {}
+        for category in sorted({r["category"] for r in results}) + ["all"]:
+            rows = [r for r in results if r["engine"] == engine and category in ("all", r["category"])]
+            times = sorted(r["time"] for r in rows if r["solved"])
+            summary[engine][category] = {
+                "positions": len(rows), "solved": len(times),
+                "solved_share": len(times) / len(rows) if rows else None,
+                "median_time": times[len(times) // 2] if times else None,
+            }
+    return summary
+
+def print_table(summary):
+    print(f"{'engine':>8} {'category':>9} {'solved':>9} {'median s':>9}")
+    for engine, categories in summary.items():
+        for category, row in categories.items():
+            median = f"{row['median_time']:.2f}" if row["median_time"] is not None else "-"
+            print(f"{engine:>8} {category:>9} {row['solved']:>4}/{row['positions']:<4} {median:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tactical test suite: time until each engine finds the right move")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="build the suite with the exact solver")
+    gen.add_argument("--count", type=int, default=300)
+    gen.add_argument("--min-stones", type=int, default=18)
+    gen.add_argument("--max-stones", type=int, default=28)
+    gen.add_argument("--seed", type=int, default=1)
+    gen.add_argument("--out", default=SUITE)
+    run = sub.add_parser("run", help="run engines on the suite")
+    run.add_argument("--suite", default=SUITE)
+    run.add_argument("--engines", default="minimax,mcts,pyspiel", help="comma separated")
+    run.add_argument("--time", type=float, default=3.0, help="time limit per position and engine")
+    run.add_argument("--limit", type=int, help="use only the first positions of the suite")
+    run.add_argument("--category", help="use only positions of this category")
+    run.add_argument("--json", help="write per-position results and the summary to this file")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        suite = generate(args.count, args.min_stones, args.max_stones, args.seed)
+        with open(args.out, "w") as f:
+            for entry in suite:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    else:
+        suite = load_suite(args.suite)
+        if args.category:
+            suite = [entry for entry in suite if entry["category"] == args.category]
+        suite = suite[:args.limit]
+        results = run_suite(suite, args.engines.split(","), args.time)
+        summary = summarize(results)
+        print_table(summary)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"summary": summary, "results": results}, f, indent=2)
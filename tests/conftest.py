@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the tests import the engine modules by plain name, like the scripts in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Connect4-MCTS"))
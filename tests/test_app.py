@@ -0,0 +1,37 @@
+import threading
+import time
+
+import app
+from move_cache import MoveCache
+
+def test_identical_concurrent_requests_apply_one_move(monkeypatch):
+    searches = []
+
+    def slow_agent(*args):
+        def strat(pos):
+            searches.append(pos)
+            time.sleep(0.3)  # long enough for the second request to join the search
+            return 3
+        return strat
+
+    monkeypatch.setattr(app, "ucb2_agent", slow_agent)
+    monkeypatch.setattr(app, "move_cache", MoveCache(16, 60))
+    agent = app.Connect4Agent()
+    board = [[0] * 7 for _ in range(6)]
+    board[5][3] = 1
+    state = app.GameState(board=board, current_player=2, valid_moves=list(range(7)))
+
+    moves = []
+    threads = [threading.Thread(target=lambda: moves.append(agent.create_position_from_game_state(state)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert moves == [3, 3]
+    assert len(searches) == 1
+    assert [row[3] for row in agent.old_board] == [0, 0, 0, 0, 2, 1]
+    assert agent.moves == [3, 3]
+    assert agent.computer_moves_made == 1
+    assert agent.pos.num_turns == 2
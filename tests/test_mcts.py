@@ -0,0 +1,17 @@
+import tracemalloc
+
+import mcts
+from connect4 import Connect4
+
+def test_node_bytes_matches_measured_tree_memory():
+    pos = Connect4().get_initial_position()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = mcts.get_nodes(pos, 2.0)  # tracemalloc slows the search to a few hundred nodes
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert len(nodes) > 200
+    per_node = retained / len(nodes)
+    assert 0.75 * mcts.NODE_BYTES <= per_node <= 1.25 * mcts.NODE_BYTES, per_node
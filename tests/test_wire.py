@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+import wire
+from server import AIResponse
+
+@pytest.mark.parametrize("evaluation", [float("-inf"), float("inf"), float("nan")])
+def test_non_finite_evaluation_is_null(evaluation):
+    response = AIResponse(move=3, evaluation=evaluation, depth=0, source="minimax")
+    body = wire.encode_response(response)
+    assert json.loads(body)["evaluation"] is None
+    assert b"Infinity" not in body and b"NaN" not in body
+
+def test_json_fallback_matches_orjson():
+    pytest.importorskip("orjson")
+    fields = {"move": 3, "evaluation": None, "depth": 8, "execution_time": 0.5, "source": "minimax"}
+    assert wire.json_dumps(fields) == wire.dumps(fields)
+
+def test_json_fallback_rejects_infinity():
+    with pytest.raises(ValueError):
+        wire.json_dumps({"evaluation": float("-inf")})
+
+@pytest.mark.parametrize("body", [b"3:3", b"1:1", b"0101010", b"3333333", b"9"])
+def test_rejects_impossible_or_finished_positions(body):
+    with pytest.raises(ValueError):
+        wire.decode_request(body)
+
+def test_decodes_moves_and_engine():
+    pos, moves, engine = wire.decode_request(b"3342;mcts")
+    assert moves == [3, 3, 4, 2] and engine == "mcts" and pos.num_turns == 4
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+from connect4 import Connect4
+from ntuple import NTupleNetwork, mirror
+from tactics import Solver
+
+# Offline training of the n-tuple network in Connect4-MCTS/ntuple.py.
+# Worker processes stream labelled positions from self-play games: moves are random among those
+# that do not lose at once (wins are always taken). Positions with at least --solve-from stones
+# are labelled by the exact solver, earlier ones by the solved value of the first such position
+# of their game (or the game result when it ends before). Labels are win 1, draw 0, loss -1 for
+# the side to move. The trainer takes SGD steps on every batch as it arrives, so the data set
+# is never held in memory, and saves the network as it goes.
+
+_solver = None
+
+def init_worker():
+    global _solver
+    _solver = Solver()
+
+def generate(job):
+    """Positions of `games` self-play games: (own stones, opponent stones, label), plus their mirror images"""
+    seed, games, solve_from = job
+    rng = random.Random(seed)
+    own, other, labels = [], [], []
+    for _ in range(games):
+        pos = Connect4().get_initial_position()
+        positions = []
+        while not pos.terminal:
+            positions.append(pos)
+            wins = pos.own_winning_mask()
+            col = pos.columns(wins)[0] if wins else rng.choice(pos.columns(pos.non_losing_mask()) or pos.legal_moves())
+            pos = pos.move(col)
+        outcome = pos.result  # for player 0, replaced by the first solved value
+        solved = {}
+        for p in positions:
+            if p.num_turns >= solve_from:
+                score = _solver.solve(p)
+                solved[p] = (score > 0) - (score < 0)
+                if len(solved) == 1:
+                    outcome = solved[p] if p.turn == 0 else -solved[p]
+        for p in positions:
+            label = solved[p] if p in solved else (outcome if p.turn == 0 else -outcome)
+            stones, opponent = p.position, p.position ^ p.mask
+            own += [stones, mirror(stones)]
+            other += [opponent, mirror(opponent)]
+            labels += [label, label]
+    return np.array(own, dtype=np.uint64), np.array(other, dtype=np.uint64), np.array(labels, dtype=np.float32)
+
+def train(network, args):
+    jobs = [(args.seed * 1_000_000 + i, args.games_per_job, args.solve_from)
+            for i in range(max(1, args.games // args.games_per_job))]
+    rng = np.random.default_rng(args.seed)
+    start = time.time()
+    positions = 0
+    error = None
+    with Pool(args.workers, initializer=init_worker) as pool:
+        for done, (own, other, labels) in enumerate(pool.imap_unordered(generate, jobs), 1):
+            order = rng.permutation(len(labels))
+            for i in range(0, len(order), args.batch):
+                batch = order[i:i + args.batch]
+                batch_error = network.train(own[batch], other[batch], labels[batch], args.learning_rate)
+                # moving average of the error on positions not trained on yet
+                error = batch_error if error is None else 0.99 * error + 0.01 * batch_error
+            positions += len(labels)
+            if done % args.save_every == 0 or done == len(jobs):
+                network.refresh()
+                network.save(args.out)
+                print(f"{done * args.games_per_job:8} games {positions:10} positions  mse {error:.4f}  "
+                      f"({positions / (time.time() - start):.0f} positions/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the n-tuple value network from streamed self-play positions")
+    parser.add_argument("--games", type=int, default=200000)
+    parser.add_argument("--games-per-job", type=int, default=50, help="games per batch sent by a worker")
+    parser.add_argument("--solve-from", type=int, default=22, help="stones from which positions are solved exactly")
+    parser.add_argument("--learning-rate", type=float, default=0.05)
+    parser.add_argument("--batch", type=int, default=256, help="positions per SGD step")
+    parser.add_argument("--save-every", type=int, default=20, help="jobs between saves")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--init", help="continue training this network")
+    parser.add_argument("--out", default="ntuple.npz")
+    args = parser.parse_args()
+
+    train(NTupleNetwork.load(args.init) if args.init else NTupleNetwork.new(), args)
@@ -0,0 +1,228 @@
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Connect4-MCTS"))
+
+from connect4 import Connect4
+from gamelog import board_from_moves
+import params
+
+# SPSA tuner: every iteration perturbs all parameters of one engine at once in a random
+# direction, plays a batch of fixed-budget self-play games between theta + c * delta and
+# theta - c * delta over a process pool, and moves theta towards the side that scored better.
+# The result is written to the tuned parameter file (Connect4-MCTS/params.py) that the engines
+# load at startup.
+
+# step: perturbation size at the first iteration, shrinking as SPSA converges;
+# integer parameters are tuned as reals and rounded by the engine's to_config
+Param = namedtuple("Param", "name low high step")
+
+MAX_MOVES = 21  # moves of one side in a full game
+
+def schedule_mean(schedule):
+    import mcts
+    return sum(mcts.scheduled_time(m, schedule) for m in range(MAX_MOVES)) / MAX_MOVES
+
+class MCTSEngine:
+    """mcts.py: exploration constant, playouts per leaf and the ucb2_agent time schedule.
+    The schedule is tuned as a distribution of a fixed game budget, only its shape matters."""
+    section = "mcts"
+
+    def __init__(self):
+        import mcts
+        self.boundaries = [up_to for up_to, _ in mcts.TIME_SCHEDULE]
+        self.reference_mean = schedule_mean(mcts.TIME_SCHEDULE)
+        self.params = [Param("UCB_C", 0.1, 6.0, 0.4), Param("NUM_RUNS", 1, 40, 3)] + [
+            Param(f"TIME_SCHEDULE[{i}]", 0.1, 15.0, 0.6) for i in range(len(self.boundaries))]
+
+    def current(self):
+        import mcts
+        return [mcts.UCB_C, mcts.NUM_RUNS] + [seconds for _, seconds in mcts.TIME_SCHEDULE]
+
+    def to_config(self, values):
+        schedule = [[up_to, seconds] for up_to, seconds in zip(self.boundaries, values[2:])]
+        # same mean time per move as the schedule in the code
+        scale = self.reference_mean / schedule_mean(schedule)
+        schedule = [[up_to, round(seconds * scale, 3)] for up_to, seconds in schedule]
+        return {"UCB_C": round(values[0], 3), "NUM_RUNS": int(round(values[1])), "TIME_SCHEDULE": schedule}
+
+    def make_player(self, config, budget):
+        import mcts
+        scale = budget / self.reference_mean
+
+        def play(pos, moves, moves_made):
+            mcts.UCB_C, mcts.NUM_RUNS = config["UCB_C"], config["NUM_RUNS"]
+            nodes = mcts.get_nodes(pos, mcts.scheduled_time(moves_made, config["TIME_SCHEDULE"]) * scale)
+            return mcts.best_move(pos, nodes, verbose=False)
+        return play
+
+class MinimaxEngine:
+    """backup.py: window weights of the evaluation"""
+    section = "minimax"
+    params = [Param("THREE_IN_ROW", 100, 5000, 150), Param("TWO_IN_ROW", 5, 1000, 25),
+              Param("BLOCK_THREE", 100, 5000, 150), Param("BLOCK_TWO", 5, 1000, 25)]
+
+    def current(self):
+        import backup
+        return [backup.THREE_IN_ROW, backup.TWO_IN_ROW, backup.BLOCK_THREE, backup.BLOCK_TWO]
+
+    def to_config(self, values):
+        return {param.name: int(round(value)) for param, value in zip(self.params, values)}
+
+    def make_player(self, config, budget):
+        import backup
+
+        def play(pos, moves, moves_made):
+            backup.set_weights(config["THREE_IN_ROW"], config["TWO_IN_ROW"], config["BLOCK_THREE"], config["BLOCK_TWO"])
+            board, player = board_from_moves(moves)
+            move, _, _, _ = backup.Connect4AI.find_best_move(board, player, pos.legal_moves(), time_limit=budget)
+            return move
+        return play
+
+_lib_bot = None
+
+def load_lib_bot():
+    global _lib_bot
+    if _lib_bot is None:
+        spec = importlib.util.spec_from_file_location("lib_bot", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                              "lib-bot.py"))
+        _lib_bot = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_lib_bot)
+    return _lib_bot
+
+class PySpielEngine:
+    """lib-bot.py: UCT exploration constant and rollouts per leaf of the PySpiel MCTSBot"""
+    section = "pyspiel"
+    params = [Param("UCT_C", 0.05, 5.0, 0.15), Param("N_ROLLOUTS", 1, 100, 4)]
+
+    def current(self):
+        lib_bot = load_lib_bot()
+        return [lib_bot.UCT_C, lib_bot.N_ROLLOUTS]
+
+    def to_config(self, values):
+        return {"UCT_C": round(values[0], 3), "N_ROLLOUTS": int(round(values[1]))}
+
+    def make_player(self, config, budget):
+        lib_bot = load_lib_bot()
+        game = lib_bot.pyspiel.load_game("connect_four")
+        bot = lib_bot.TimedMCTSBot(game, target_time=budget, uct_c=config["UCT_C"], n_rollouts=config["N_ROLLOUTS"])
+
+        def play(pos, moves, moves_made):
+            state = game.new_initial_state()
+            for col in moves:
+                state.apply_action(col)
+            return bot.step(state)
+        return play
+
+ENGINES = {"mcts": MCTSEngine, "minimax": MinimaxEngine, "pyspiel": PySpielEngine}
+_engine = None
+
+def init_worker(engine_name):
+    global _engine
+    _engine = ENGINES[engine_name]()
+    # the engines report every search; keep the tuner output readable
+    sys.stdout = open(os.devnull, "w")
+
+def play_game(config_a, config_b, opening, a_first, budget):
+    """Result for config_a: 1 win, 0 draw, -1 loss, from the given opening moves"""
+    players = [_engine.make_player(config_a, budget), _engine.make_player(config_b, budget)]
+    if not a_first:
+        players.reverse()
+    pos = Connect4().get_initial_position()
+    moves = list(opening)
+    for col in moves:
+        pos = pos.move(col)
+    while not pos.terminal:
+        side = len(moves) % 2
+        move = players[side](pos, moves, (len(moves) - side) // 2)
+        if move not in pos.legal_moves():
+            return -1 if (side == 0) == a_first else 1
+        moves.append(move)
+        pos = pos.move(move)
+    if pos.result == 0:
+        return 0
+    # result is from the first player's point of view
+    return 1 if (pos.result == 1) == a_first else -1
+
+def random_opening(rng, plies):
+    pos = Connect4().get_initial_position()
+    moves = []
+    while len(moves) < plies:
+        col = rng.choice(pos.columns(pos.non_losing_mask()) or pos.legal_moves())
+        moves.append(col)
+        pos = pos.move(col)
+    return moves
+
+def match(pool, config_a, config_b, games, budget, rng, opening_plies):
+    """Mean result of config_a over games played in pairs: same opening, each side moving first once"""
+    futures = []
+    for _ in range(games // 2):
+        opening = random_opening(rng, opening_plies)
+        futures.append(pool.submit(play_game, config_a, config_b, opening, True, budget))
+        futures.append(pool.submit(play_game, config_a, config_b, opening, False, budget))
+    results = [future.result() for future in futures]
+    return sum(results) / len(results)
+
+def clip(values, specs):
+    return [min(spec.high, max(spec.low, value)) for value, spec in zip(values, specs)]
+
+def spsa(engine, pool, args, rng):
+    specs = engine.params
+    theta = [float(value) for value in engine.current()]
+    decay = args.iterations / 10  # stability constant A of the SPSA gain sequence
+    for k in range(args.iterations):
+        start = time.time()
+        c = [spec.step / (k + 1) ** 0.101 for spec in specs]
+        a = args.learning_rate * ((decay + 1) / (k + 1 + decay)) ** 0.602
+        delta = [rng.choice((-1, 1)) for _ in specs]
+        plus = clip([t + ci * d for t, ci, d in zip(theta, c, delta)], specs)
+        minus = clip([t - ci * d for t, ci, d in zip(theta, c, delta)], specs)
+        score = match(pool, engine.to_config(plus), engine.to_config(minus), args.games, args.budget, rng,
+                      args.opening_plies)
+        # gradient estimate score / (2 c delta), step a * c^2 per unit of gradient
+        theta = clip([t + a * ci * score * d for t, ci, d in zip(theta, c, delta)], specs)
+        print(f"{k + 1:4} score {score:+.3f} ({time.time() - start:.0f}s) "
+              + " ".join(f"{spec.name}={value:.3g}" for spec, value in zip(specs, theta)))
+    return theta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SPSA tuning of search parameters by fixed-budget self-play")
+    parser.add_argument("engine", choices=sorted(ENGINES))
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--games", type=int, default=32, help="games per iteration (played in color-swapped pairs)")
+    parser.add_argument("--budget", type=float, default=0.1, help="mean seconds per move")
+    parser.add_argument("--learning-rate", type=float, default=2.0, help="first step, in perturbation sizes per unit score")
+    parser.add_argument("--opening-plies", type=int, default=4, help="random moves before the engines take over")
+    parser.add_argument("--verify", type=int, default=200,
+                        help="games of the result against the current parameters; written only if it scores >= 0 "
+                             "(0 = no check)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--out", default=params.PATH, help="tuned parameter file")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    engine = ENGINES[args.engine]()
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(args.engine,)) as pool:
+        theta = spsa(engine, pool, args, rng)
+        tuned = engine.to_config(theta)
+        baseline = engine.to_config([float(value) for value in engine.current()])
+        verify = match(pool, tuned, baseline, args.verify, args.budget, rng, args.opening_plies) if args.verify else None
+
+    print(f"tuned {tuned}")
+    if verify is not None:
+        print(f"against current {baseline}: {verify:+.3f} over {args.verify} games")
+    if verify is None or verify >= 0:
+        params.save(engine.section, tuned, {
+            "iterations": args.iterations, "games": args.games, "budget": args.budget,
+            "verify_score": verify, "verify_games": args.verify, "date": time.strftime("%Y-%m-%d"),
+        }, path=args.out)
+        print(f"written to {args.out}")
+    else:
+        print("not better than the current parameters, nothing written")